@@ -0,0 +1,340 @@
+import os
+import sys
+import hmac
+import json
+import logging
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import pandas as pd
+from armazenamento import obter_armazenamento
+from historico import obter_historico
+from registro import (ArmarioAlteradoMeioTempo, ArmarioIndisponivel, ArmarioNaoEncontrado, ErroRegistro,
+                      SemArmarioDisponivel, obter_registro_compartilhado)
+
+logger = logging.getLogger(__name__)
+
+# Porta padrão da API
+PORTA_API = 8502
+
+# Endereço padrão: só a própria máquina. Para atender a rede, defina
+# ARMARIOS_API_ENDERECO (por exemplo 0.0.0.0) junto com ARMARIOS_API_TOKEN
+ENDERECO_API = '127.0.0.1'
+ENDERECOS_LOCAIS = ('127.0.0.1', '::1', 'localhost')
+
+# Quantidade padrão e máxima de armários por resposta da listagem
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+# Filtros aceitos na listagem (os mesmos de RegistroArmarios.consultar)
+FILTROS_LISTAGEM = ('status', 'localizacao', 'numero', 'nome', 'turma', 'data_inicio', 'data_fim')
+
+# Código HTTP de cada erro do registro
+STATUS_ERROS = [
+    (ArmarioNaoEncontrado, HTTPStatus.NOT_FOUND),
+    (ArmarioAlteradoMeioTempo, HTTPStatus.PRECONDITION_FAILED),
+    (ArmarioIndisponivel, HTTPStatus.CONFLICT),
+    (SemArmarioDisponivel, HTTPStatus.CONFLICT),
+    (ErroRegistro, HTTPStatus.BAD_REQUEST),
+]
+
+
+# Erro de uma requisição, respondido com o código e a mensagem informados
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# Registro compartilhado com a interface: mesmo armazenamento, mesmo histórico
+# e, no mesmo processo, a mesma instância em memória
+def _registro():
+    return obter_registro_compartilhado(obter_armazenamento(), obter_historico())
+
+# Converte linhas do cadastro para JSON: sem a chave interna, datas em ISO
+# (aaaa-mm-dd) e valores ausentes como null
+def _armarios_json(df):
+    df = df.drop(columns='chave', errors='ignore')
+    if pd.api.types.is_datetime64_any_dtype(df['data']):
+        df = df.assign(data=df['data'].dt.strftime('%Y-%m-%d'))
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+# ETag de um armário, a partir da versão usada na verificação otimista
+def _etag_armario(versao):
+    return f'"{versao}"'
+
+def _versao_do_etag(etag):
+    versao = etag.strip().strip('"')
+    if len(versao) != 16 or any(c not in '0123456789abcdef' for c in versao):
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"If-Match inválido: {etag}")
+    return versao
+
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    server_version = 'ArmariosAPI/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    # Rotas: (método, partes fixas do caminho) -> função. '*' casa com um id_unico.
+    ROTAS = {
+        ('GET', ('armarios',)): 'listar',
+        ('GET', ('armarios', '*')): 'obter',
+        ('GET', ('busca',)): 'buscar',
+        ('GET', ('ocupacao',)): 'ocupacao',
+        ('POST', ('armarios', '*', 'alocar')): 'alocar',
+        ('POST', ('armarios', '*', 'liberar')): 'liberar',
+        ('POST', ('armarios', 'proximo')): 'alocar_proximo',
+        ('POST', ('lote',)): 'lote',
+    }
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+    def _atender(self, metodo):
+        endereco = urlsplit(self.path)
+        partes = tuple(unquote(parte) for parte in endereco.path.strip('/').split('/') if parte)
+        self.parametros = {chave: valores[-1] for chave, valores in parse_qs(endereco.query).items()}
+        try:
+            nome, argumentos = self._rota(metodo, partes)
+            if metodo == 'POST':
+                self._autorizar()
+            getattr(self, f'_rota_{nome}')(*argumentos)
+        except ErroRequisicao as e:
+            self._responder(e.status, {'erro': str(e)})
+        except ErroRegistro as e:
+            status = next(status for tipo, status in STATUS_ERROS if isinstance(e, tipo))
+            self._responder(status, {'erro': str(e)})
+        except Exception:
+            logger.exception("Erro ao atender %s %s", metodo, self.path)
+            self._responder(HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': 'Erro interno'})
+
+    def _rota(self, metodo, partes):
+        # Rotas fixas têm prioridade sobre as com id_unico (POST /armarios/proximo)
+        if (metodo, partes) in self.ROTAS:
+            return self.ROTAS[(metodo, partes)], ()
+        for (metodo_rota, padrao), nome in self.ROTAS.items():
+            if metodo_rota == metodo and len(padrao) == len(partes) and all(
+                p == '*' or p == parte for p, parte in zip(padrao, partes)
+            ):
+                return nome, tuple(parte for p, parte in zip(padrao, partes) if p == '*')
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, f"Rota não encontrada: {metodo} {urlsplit(self.path).path}")
+
+    # Requisições que alteram armários exigem o token de ARMARIOS_API_TOKEN,
+    # quando definido, no cabeçalho Authorization: Bearer <token>
+    def _autorizar(self):
+        token = os.environ.get('ARMARIOS_API_TOKEN')
+        if not token:
+            return
+        esquema, _, informado = self.headers.get('Authorization', '').partition(' ')
+        if esquema.lower() != 'bearer' or not hmac.compare_digest(informado.strip().encode(), token.encode()):
+            raise ErroRequisicao(HTTPStatus.UNAUTHORIZED, "Token de acesso ausente ou inválido")
+
+    def _corpo(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if not tamanho:
+            return {}
+        try:
+            corpo = json.loads(self.rfile.read(tamanho))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Corpo da requisição não é um JSON válido") from None
+        if not isinstance(corpo, dict):
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "O corpo da requisição deve ser um objeto JSON")
+        return corpo
+
+    def _inteiro(self, nome, padrao=None, minimo=None, maximo=None):
+        valor = self.parametros.get(nome)
+        if valor is None:
+            return padrao
+        try:
+            valor = int(valor)
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"Parâmetro '{nome}' deve ser um número inteiro") from None
+        if minimo is not None:
+            valor = max(valor, minimo)
+        return min(valor, maximo) if maximo is not None else valor
+
+    # Responde 304 se o cliente já tem a versão identificada pelo ETag
+    def _nao_modificado(self, etag):
+        return etag in (parte.strip() for parte in self.headers.get('If-None-Match', '').split(','))
+
+    def _responder(self, status, dados=None, etag=None):
+        corpo = b'' if dados is None else json.dumps(dados, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if dados is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if corpo:
+            self.wfile.write(corpo)
+
+    def log_message(self, formato, *argumentos):
+        logger.info("%s - %s", self.address_string(), formato % argumentos)
+
+    # GET /armarios?status=&localizacao=&numero=&nome=&turma=&data_inicio=&data_fim=&inicio=&limite=
+    def _rota_listar(self):
+        registro = _registro()
+        # O conteúdo depende só da versão do cadastro (o ETag vale para esta URL)
+        etag = f'W/"{registro.versao[0]}-{registro.versao[1]}"'
+        if self._nao_modificado(etag):
+            self._responder(HTTPStatus.NOT_MODIFIED, etag=etag)
+            return
+        filtros = {nome: self.parametros[nome] for nome in FILTROS_LISTAGEM if nome in self.parametros}
+        if 'numero' in filtros:
+            filtros['numero'] = self._inteiro('numero')
+        inicio = self._inteiro('inicio', 0, minimo=0)
+        limite = self._inteiro('limite', LIMITE_PADRAO, minimo=1, maximo=LIMITE_MAXIMO)
+        try:
+            resultado = registro.consultar(**filtros)
+        except ValueError as e:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"Filtro inválido: {e}") from None
+        self._responder(HTTPStatus.OK, {
+            'total': len(resultado),
+            'inicio': inicio,
+            'armarios': _armarios_json(resultado.iloc[inicio:inicio + limite])
+        }, etag)
+
+    # GET /armarios/<id_unico>
+    def _rota_obter(self, id_unico):
+        armario, versao = _registro().obter_com_versao(id_unico)
+        etag = _etag_armario(versao)
+        if self._nao_modificado(etag):
+            self._responder(HTTPStatus.NOT_MODIFIED, etag=etag)
+            return
+        self._responder(HTTPStatus.OK, _armarios_json(armario)[0], etag)
+
+    # GET /busca?nome=... (ou turma=...)&status=&limite=: melhores resultados primeiro
+    def _rota_buscar(self):
+        coluna = next((coluna for coluna in ('nome', 'turma') if self.parametros.get(coluna)), None)
+        if coluna is None:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Informe o parâmetro 'nome' ou 'turma'")
+        limite = self._inteiro('limite', LIMITE_PADRAO, minimo=1, maximo=LIMITE_MAXIMO)
+        resultados = _registro().buscar(coluna, self.parametros[coluna], self.parametros.get('status'), limite)
+        self._responder(HTTPStatus.OK, {'armarios': _armarios_json(resultados)})
+
+    # GET /ocupacao: contagens por localização
+    def _rota_ocupacao(self):
+        registro = _registro()
+        etag = f'W/"{registro.versao[0]}-{registro.versao[1]}"'
+        if self._nao_modificado(etag):
+            self._responder(HTTPStatus.NOT_MODIFIED, etag=etag)
+            return
+        self._responder(HTTPStatus.OK, {
+            'total': registro.contar_por_status(),
+            'localizacoes': [
+                {'localizacao': localizacao, 'ocupados': ocupados, 'disponiveis': disponiveis}
+                for localizacao, ocupados, disponiveis in registro.ocupacao_por_localizacao()
+            ]
+        }, etag)
+
+    # Versão esperada do armário, pelo cabeçalho If-Match (ETag de GET /armarios/<id_unico>)
+    def _versao_esperada(self):
+        etag = self.headers.get('If-Match')
+        return _versao_do_etag(etag) if etag and etag.strip() != '*' else None
+
+    def _responder_armario(self, registro, id_unico, status=HTTPStatus.OK):
+        armario, versao = registro.obter_com_versao(id_unico)
+        self._responder(status, _armarios_json(armario)[0], _etag_armario(versao))
+
+    # POST /armarios/<id_unico>/alocar {"nome": ..., "turma": ..., "operador": ...}
+    def _rota_alocar(self, id_unico):
+        corpo = self._corpo()
+        if not corpo.get('nome') or not corpo.get('turma'):
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Nome e turma são obrigatórios")
+        registro = _registro()
+        registro.alocar(id_unico, str(corpo['nome']), str(corpo['turma']),
+                        versao_esperada=self._versao_esperada(), operador=corpo.get('operador'))
+        self._responder_armario(registro, id_unico)
+
+    # POST /armarios/<id_unico>/liberar {"operador": ...}
+    def _rota_liberar(self, id_unico):
+        corpo = self._corpo()
+        registro = _registro()
+        registro.liberar(id_unico, versao_esperada=self._versao_esperada(), operador=corpo.get('operador'))
+        self._responder_armario(registro, id_unico)
+
+    # POST /armarios/proximo {"nome": ..., "turma": ..., "localizacoes": [...], "operador": ...}
+    def _rota_alocar_proximo(self):
+        corpo = self._corpo()
+        if not corpo.get('nome') or not corpo.get('turma'):
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Nome e turma são obrigatórios")
+        registro = _registro()
+        localizacoes = corpo.get('localizacoes')
+        if localizacoes is not None:
+            conhecidas = set(registro.localizacoes())
+            if (not isinstance(localizacoes, list) or not localizacoes
+                    or not all(isinstance(localizacao, str) and localizacao in conhecidas for localizacao in localizacoes)):
+                raise ErroRequisicao(HTTPStatus.BAD_REQUEST,
+                                     f"'localizacoes' deve ser uma lista com localizações existentes: {sorted(conhecidas)}")
+        id_unico = registro.alocar_proximo(str(corpo['nome']), str(corpo['turma']),
+                                           localizacoes, operador=corpo.get('operador'))
+        self._responder_armario(registro, id_unico, HTTPStatus.CREATED)
+
+    # POST /lote {"operacao": "alocar" | "liberar" | "atribuir", "itens": [{...}, ...],
+    #             "tudo_ou_nada": false, "politica": {"turma": ["localizacao", ...]}, "operador": ...}
+    def _rota_lote(self):
+        corpo = self._corpo()
+        operacao = corpo.get('operacao', 'alocar')
+        itens = corpo.get('itens')
+        if not isinstance(itens, list) or not all(isinstance(item, dict) for item in itens):
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "'itens' deve ser uma lista de objetos")
+        lote = pd.DataFrame(itens, dtype=object).astype('string')
+        registro = _registro()
+        if operacao == 'atribuir':
+            relatorio = registro.atribuir_lote(lote, corpo.get('politica'), corpo.get('qualquer_localizacao', True),
+                                               operador=corpo.get('operador'))
+        elif operacao in ('alocar', 'liberar'):
+            relatorio = registro.importar_lote(lote, operacao, bool(corpo.get('tudo_ou_nada')),
+                                               operador=corpo.get('operador'))
+        else:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"Operação de lote desconhecida: '{operacao}'")
+        self._responder(HTTPStatus.OK, {
+            'resultado': relatorio.astype(object).where(relatorio.notna(), None).to_dict('records')
+        })
+
+
+# Cria o servidor da API (ainda sem atender requisições). Sem endereço, usa
+# ARMARIOS_API_ENDERECO ou só a própria máquina; fora dela, exige ARMARIOS_API_TOKEN
+# para que ninguém na rede possa alocar ou liberar armários sem autorização.
+def criar_servidor(porta=PORTA_API, endereco=None):
+    endereco = endereco or os.environ.get('ARMARIOS_API_ENDERECO', ENDERECO_API)
+    if endereco not in ENDERECOS_LOCAIS and not os.environ.get('ARMARIOS_API_TOKEN'):
+        raise ValueError(f"Defina ARMARIOS_API_TOKEN para atender a API em '{endereco}' (fora desta máquina)")
+    servidor = ThreadingHTTPServer((endereco, porta), ManipuladorAPI)
+    servidor.daemon_threads = True
+    return servidor
+
+_servidor = None
+_trava_servidor = threading.Lock()
+
+# Inicia a API em uma thread do processo atual (uma única vez por processo),
+# compartilhando o registro em memória com a interface. Usada pelo app.py
+# quando a variável de ambiente ARMARIOS_API_PORTA está definida.
+def iniciar_em_segundo_plano(porta=PORTA_API, endereco=None):
+    global _servidor
+    with _trava_servidor:
+        if _servidor is None:
+            _servidor = criar_servidor(porta, endereco)
+            threading.Thread(target=_servidor.serve_forever, name='api-armarios', daemon=True).start()
+            logger.info("API de armários atendendo em %s:%s", *_servidor.server_address[:2])
+        return _servidor
+
+
+if __name__ == '__main__':
+    # Uso: python api.py [porta]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.environ.get('ARMARIOS_API_PORTA', PORTA_API))
+    servidor = criar_servidor(porta)
+    logger.info("API de armários atendendo em %s:%s", *servidor.server_address[:2])
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Grava as alterações ainda pendentes antes de sair
+        _registro().descarregar()
+        servidor.server_close()
@@ -1,9 +1,17 @@
+import os
+import hmac
 import streamlit as st
 import pandas as pd
-import os
 import datetime
-import io
-import matplotlib.pyplot as plt
+from functools import partial
+from armazenamento import (assinatura_arquivo, ler_com_cache, obter_armazenamento, planilha_sincronizada,
+                           sincronizar_com_planilha)
+from registro import ErroRegistro, obter_registro_compartilhado, politica_de_tabela, rotulos_armarios
+from api import iniciar_em_segundo_plano
+from diagnostico import memoria_atual_mb, memoria_pico_mb, obter_diagnostico
+from historico import EVENTO_ALOCACAO, EVENTO_LIBERACAO, obter_historico
+from relatorios import (FORMATOS_EXPORTACAO, criar_grafico_ocupacao, criar_grafico_por_localizacao,
+                        exportacao_em_cache, gerar_exportacao)
 
 # Configuração da página
 st.set_page_config(
@@ -13,62 +21,48 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Função para criar um link de download para um DataFrame
-def gerar_link_download_excel(df, nome_arquivo="dados"):
-    # Criar um buffer de bytes para o arquivo Excel
-    output = io.BytesIO()
-    # Escrever o DataFrame para o buffer como um arquivo Excel
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Dados')
-    # Obter os bytes do buffer
-    dados_excel = output.getvalue()
-    # Criar o link de download
-    st.download_button(
-        label=f"📥 Baixar dados em Excel",
-        data=dados_excel,
-        file_name=f"{nome_arquivo}_{datetime.datetime.now().strftime('%d%m%Y_%H%M%S')}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-# Função para criar um gráfico de pizza da ocupação dos armários
-def criar_grafico_ocupacao(ocupados, disponiveis):
-    # Dados para o gráfico de pizza
-    labels = ['Ocupados', 'Disponíveis']
-    sizes = [ocupados, disponiveis]
-    colors = ['#FF9966', '#66B2FF']  # Laranja claro e azul claro
-
-    # Criar o gráfico de pizza
-    fig, ax = plt.subplots(figsize=(4, 2))
-    wedges, texts, autotexts = ax.pie(
-        sizes,
-        labels=labels,
-        colors=colors,
-        autopct='%1.1f%%',
-        startangle=55,
-        shadow=False,
-        textprops={'fontsize': 6, 'weight': 'bold'}
-    )
-
-    # Personalizar cores dos textos
-    for text in texts:
-        text.set_color('#333333')
-    for autotext in autotexts:
-        autotext.set_color('white')
-        autotext.set_fontsize(6)
-        autotext.set_weight('bold')
-
-    ax.axis('equal')  # Garante que o gráfico seja um círculo
-    #plt.title('Ocupação de Armários', fontsize=16, pad=20)
-    plt.tight_layout()
-
-    return fig
-
-# Aplica o CSS customizado do arquivo styles.css
-try:
-    with open("styles.css") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-except Exception as e:
-    st.warning(f"Não foi possível carregar o CSS customizado: {e}")
+# Medição das fases desta execução do script, exibida na página de diagnóstico
+diagnostico = obter_diagnostico()
+execucao = diagnostico.iniciar()
+
+# Planilha com as faixas de armários de cada localização
+ARQUIVO_ARMARIOS = 'armarios.xlsx'
+
+# Colunas internas do cadastro, que não são exibidas nas tabelas
+COLUNAS_OCULTAS = ('chave', 'id_unico')
+
+# Exibição das colunas tipadas do cadastro nas tabelas
+CONFIG_COLUNAS = {'data': st.column_config.DateColumn("data", format="DD-MM-YYYY")}
+
+# Função para criar os links de download de um DataFrame, um botão por formato.
+# Os botões não reexecutam o script (on_click="ignore"), então os resultados de
+# uma pesquisa ou de um lote continuam na tela. Cada arquivo só é gerado quando
+# o usuário clica no botão; com parametros (os filtros que produziram o
+# DataFrame), os bytes ficam em cache para a versão atual do cadastro.
+def gerar_link_download(df, nome_arquivo="dados", parametros=None):
+    momento = datetime.datetime.now().strftime('%d%m%Y_%H%M%S')
+    for coluna, (formato, (rotulo, mime)) in zip(st.columns(len(FORMATOS_EXPORTACAO)), FORMATOS_EXPORTACAO.items()):
+        # A exportação roda quando o usuário clica em baixar, fora desta execução
+        # do script; por isso é medida à parte
+        def gerar_medido(formato=formato):
+            exportacao = diagnostico.iniciar('exportacao')
+            with exportacao.fase(f"exportacao: {formato}"):
+                dados = gerar_exportacao(df, formato)
+            exportacao.concluir(formato=formato, linhas=len(df), bytes=len(dados))
+            return dados
+
+        gerar = gerar_medido
+        if parametros is not None:
+            gerar = partial(exportacao_em_cache, (parametros, registro.versao, formato), gerar_medido)
+
+        # Criar o link de download
+        coluna.download_button(
+            label=f"📥 Baixar dados em {rotulo}",
+            data=gerar,
+            file_name=f"{nome_arquivo}_{momento}.{formato}",
+            mime=mime,
+            on_click="ignore"
+        )
 
 # Função para criar um cabeçalho estilizado
 def header_estilizado(titulo, icone="🔐"):
@@ -78,393 +72,628 @@ def header_estilizado(titulo, icone="🔐"):
 # Título do aplicativo
 header_estilizado("Sistema de Controle de Armários")
 
-# Função para gerar um ID único para cada armário
-def gerar_id_unico(numero, localizacao):
-    # Remove espaços e caracteres especiais da localização
-    loc_formatada = ''.join(e for e in localizacao if e.isalnum()).upper()
-    # Cria um ID combinando a localização e o número
-    return f"{loc_formatada}-{numero:04d}"
-
 # Função para carregar os dados dos armários da planilha Excel
 def carregar_dados_armarios():
     try:
         # Tente carregar a planilha Excel com as informações dos armários
-        df_info = pd.read_excel('armarios.xlsx')
+        # (o conteúdo é reaproveitado enquanto o arquivo não mudar)
+        df_info = ler_com_cache(ARQUIVO_ARMARIOS, pd.read_excel)
         return df_info
     except Exception as e:
         st.error(f"Erro ao carregar a planilha de armários: {e}")
         return None
 
-# Função para carregar os registros existentes
-def carregar_registros():
-    if os.path.exists('registros_armarios.csv'):
-        df = pd.read_csv('registros_armarios.csv')
-        # Converte a coluna 'numero' para inteiro se não for nulo
-        if 'numero' in df.columns:
-            df['numero'] = pd.to_numeric(df['numero'], errors='coerce').fillna(0).astype(int)
-        return df
-    else:
-        # Se o arquivo não existir, cria um DataFrame vazio com as colunas necessárias
-        return pd.DataFrame(columns=['id_unico', 'numero', 'localizacao', 'nome', 'turma', 'status', 'data'])
-
-# Função para salvar os registros
-def salvar_registros(df):
-    df.to_csv('registros_armarios.csv', index=False)
-
 # Função para inicializar os registros com base nas informações dos armários
 def inicializar_registros(df_info):
-    registros = carregar_registros()
-
-    # Verifica se o arquivo de registros já tem a coluna id_unico
-    if 'id_unico' not in registros.columns:
-        # Se o arquivo existir mas não tiver a coluna id_unico, adiciona a coluna
-        if len(registros) > 0:
-            registros['id_unico'] = registros.apply(lambda row: gerar_id_unico(row['numero'], row['localizacao']), axis=1)
-            salvar_registros(registros)
-            return registros
-
-    # Se o arquivo de registros estiver vazio (apenas cabeçalho), inicializa com os armários disponíveis
-    if len(registros) == 0:
-        novos_registros = []
-
-        # Para cada linha na planilha de informações
-        for _, row in df_info.iterrows():
-            localizacao = row['Localização']
-            inicio = int(row['Início'])
-            fim = int(row['Fim'])
-
-            # Cria um registro para cada armário no intervalo
-            for numero in range(inicio, fim + 1):
-                id_unico = gerar_id_unico(numero, localizacao)
-                novos_registros.append({
-                    'id_unico': id_unico,
-                    'numero': numero,
-                    'localizacao': localizacao,
-                    'nome': '',
-                    'turma': '',
-                    'status': 'Disponível',
-                    'data': ''
-                })
-
-        # Cria um novo DataFrame com os registros e salva
-        registros = pd.DataFrame(novos_registros)
-        salvar_registros(registros)
-
-    return registros
-
-# Carrega as informações dos armários
-df_info_armarios = carregar_dados_armarios()
-
-# Se conseguiu carregar as informações, inicializa os registros
-if df_info_armarios is not None:
-    df_registros = inicializar_registros(df_info_armarios)
-
-    # Sidebar para navegação
-    st.sidebar.title("Navegação")
-    opcao = st.sidebar.radio(
-        "Selecione uma opção:",
-        ["Visão Geral", "Alocar Armário", "Liberar Armário", "Pesquisar"]
-    )
-
-    # Visão Geral
-    if opcao == "Visão Geral":
-        st.header("Visão Geral dos Armários")
-
-        # Estatísticas
-        total_armarios = len(df_registros)
-        ocupados = len(df_registros[df_registros['status'] == 'Ocupado'])
-        disponiveis = total_armarios - ocupados
-
-        # Adicionar gráfico de pizza logo após o cabeçalho
-        fig = criar_grafico_ocupacao(ocupados, disponiveis)
-        st.pyplot(fig)
-
-        # Métricas em cards
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Total de Armários", total_armarios)
-        col2.metric("Armários Ocupados", ocupados)
-        col3.metric("Armários Disponíveis", disponiveis)
-
-        # Filtros
-        st.subheader("Filtros")
-        col1, col2 = st.columns(2)
-        with col1:
-            filtro_status = st.selectbox(
-                "Status",
-                ["Todos", "Disponível", "Ocupado"]
-            )
-        with col2:
-            localizacoes = ["Todas"] + df_registros['localizacao'].unique().tolist()
-            filtro_localizacao = st.selectbox("Localização", localizacoes)
-
-        # Aplicar filtros
-        df_filtrado = df_registros.copy()
-        if filtro_status != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['status'] == filtro_status]
-        if filtro_localizacao != "Todas":
-            df_filtrado = df_filtrado[df_filtrado['localizacao'] == filtro_localizacao]
-
-        # Exibir tabela filtrada sem o id_unico e sem índice
-        colunas_exibir = [col for col in df_filtrado.columns if col != 'id_unico']
-        st.dataframe(df_filtrado[colunas_exibir], hide_index=True)
-
-        # Adicionar link para download dos dados filtrados
-        if len(df_filtrado) > 0:
-            nome_arquivo = "armarios_visao_geral"
-            if filtro_status != "Todos":
-                nome_arquivo += f"_{filtro_status.lower()}"
-            if filtro_localizacao != "Todas":
-                nome_arquivo += f"_{filtro_localizacao.replace(' ', '_').lower()}"
-
-            gerar_link_download_excel(df_filtrado[colunas_exibir], nome_arquivo)
-
-    # Alocar Armário
-    elif opcao == "Alocar Armário":
-        st.header("Alocar Armário")
-
-        # Filtros para encontrar armários disponíveis
-        localizacoes = ["Todas"] + df_registros['localizacao'].unique().tolist()
-        filtro_localizacao = st.selectbox("Localização", localizacoes)
-
-        # Filtrar armários disponíveis
-        df_disponiveis = df_registros[df_registros['status'] == 'Disponível']
-        if filtro_localizacao != "Todas":
-            df_disponiveis = df_disponiveis[df_disponiveis['localizacao'] == filtro_localizacao]
-
-        if len(df_disponiveis) > 0:
-            # Formulário para alocação
-            with st.form("form_alocacao"):
-                st.subheader("Dados do Aluno")
-
-                # Selecionar armário disponível - sem mostrar o ID único na interface
-                opcoes_armarios_display = [f"{row['numero']} - {row['localizacao']}" for _, row in df_disponiveis.iterrows()]
-                # Dicionário para mapear a opção exibida para o ID único
-                mapa_opcoes_para_id = {f"{row['numero']} - {row['localizacao']}": row['id_unico'] for _, row in df_disponiveis.iterrows()}
-
-                armario_selecionado_display = st.selectbox("Selecione o Armário", opcoes_armarios_display)
-
-                # Obter o ID único do armário selecionado usando o mapeamento
-                id_unico_selecionado = mapa_opcoes_para_id[armario_selecionado_display]
-
-                # Dados do aluno
-                nome_aluno = st.text_input("Nome do Aluno")
-                turma_aluno = st.text_input("Turma")
-
-                # Botão de submissão
-                submitted = st.form_submit_button("Alocar Armário")
-
-                if submitted:
-                    if nome_aluno and turma_aluno:
-                        # Converter dados para UPPER CASE
-                        nome_aluno = nome_aluno.upper()
-                        turma_aluno = turma_aluno.upper()
-
-                        # Atualiza o registro
-                        idx = df_registros[df_registros['id_unico'] == id_unico_selecionado].index[0]
-                        df_registros.at[idx, 'nome'] = nome_aluno
-                        df_registros.at[idx, 'turma'] = turma_aluno
-                        df_registros.at[idx, 'status'] = 'Ocupado'
-                        df_registros.at[idx, 'data'] = datetime.datetime.now().strftime("%d-%m-%Y")
-
-                        # Salva os registros atualizados
-                        salvar_registros(df_registros)
-
-                        st.success(f"Armário {armario_selecionado_display} alocado com sucesso para {nome_aluno}!")
-                    else:
-                        st.error("Por favor, preencha todos os campos.")
-        else:
-            st.warning("Não há armários disponíveis com os filtros selecionados.")
-
-    # Liberar Armário
-    elif opcao == "Liberar Armário":
-        st.header("Liberar Armário")
-
-        # Filtrar apenas armários ocupados
-        df_ocupados = df_registros[df_registros['status'] == 'Ocupado']
-
-        if len(df_ocupados) > 0:
-            # Opções para pesquisar o armário a ser liberado
-            opcao_pesquisa = st.radio(
-                "Pesquisar por:",
-                ["Número do Armário", "Nome do Aluno"]
+    armazenamento = obter_armazenamento()
+
+    # Cadastros antigos sem a coluna id_unico recebem o identificador na leitura
+    # (armazenamento.preencher_id_unico), e ele é gravado na próxima compactação
+
+    # Acrescenta ao cadastro os armários da planilha que ainda não existem nele
+    # (com o cadastro vazio, todos). A comparação só é refeita quando a planilha
+    # muda, uma vez por processo, e não a cada sessão nova.
+    assinatura_planilha = assinatura_arquivo(ARQUIVO_ARMARIOS)
+    if not planilha_sincronizada(armazenamento, assinatura_planilha):
+        cadastro_vazio = armazenamento.total() == 0
+        adicionados = sincronizar_com_planilha(armazenamento, df_info, assinatura_planilha)
+        if adicionados and not cadastro_vazio:
+            st.toast(f"{adicionados} armários novos da planilha foram adicionados ao cadastro.")
+
+    return armazenamento
+
+# Função para ler o arquivo enviado na importação em lote (CSV ou Excel)
+def ler_arquivo_lote(arquivo):
+    if arquivo.name.lower().endswith('.xlsx'):
+        return pd.read_excel(arquivo, dtype=str)
+    return pd.read_csv(arquivo, dtype=str, sep=None, engine='python')
+
+# Armário exibido na execução anterior da página, com a versão que o usuário viu.
+# Cada clique gera uma nova execução: ao confirmar uma operação, ela é aplicada
+# ao armário que estava na tela, e é recusada se outra sessão o alterou nesse
+# intervalo (em vez de agir sobre outro armário ou sobrescrever a alteração).
+def armario_exibido(chave, id_unico):
+    anterior = st.session_state.get(chave)
+    st.session_state[chave] = (id_unico, registro.versao_armario(id_unico))
+    return anterior if anterior is not None else st.session_state[chave]
+
+# Quantidade de armários enviada ao navegador por página do seletor
+TAMANHO_PAGINA_ARMARIOS = 50
+
+# Interpreta o filtro de número do seletor: "12" (números que começam com 12)
+# ou "10-50" (faixa). Devolve (numero_min, numero_max, prefixo).
+def interpretar_filtro_numero(texto):
+    texto = texto.replace(' ', '')
+    if '-' in texto:
+        inicio, _, fim = texto.partition('-')
+        if (inicio and not inicio.isdigit()) or (fim and not fim.isdigit()):
+            raise ValueError(texto)
+        return (int(inicio) if inicio else None, int(fim) if fim else None, None)
+    if texto and not texto.isdigit():
+        raise ValueError(texto)
+    return (None, None, texto or None)
+
+# Filtros do seletor de armários (número ou faixa e página). A busca acontece
+# no servidor e só a página atual de opções é enviada ao navegador. Devolve
+# os ids da página e o mapeamento id_unico -> rótulo exibido.
+def pagina_seletor_armarios(status, chave, localizacao=None):
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        filtro_numero = st.text_input(
+            "Número do armário", key=f"{chave}_numero", placeholder="Ex.: 12 ou 10-50",
+            help="Números que começam com o valor digitado, ou uma faixa no formato início-fim",
+            # Um novo filtro volta para a primeira página
+            on_change=st.session_state.pop, args=(f"{chave}_pagina", None)
+        )
+    try:
+        numero_min, numero_max, prefixo = interpretar_filtro_numero(filtro_numero)
+    except ValueError:
+        st.error(f"Número inválido: '{filtro_numero}'. Use um número (ex.: 12) ou uma faixa (ex.: 10-50).")
+        numero_min = numero_max = prefixo = None
+    opcoes = registro.opcoes_armarios(status, localizacao, numero_min, numero_max, prefixo)
+
+    total_paginas = max(1, -(-len(opcoes) // TAMANHO_PAGINA_ARMARIOS))
+    with col2:
+        pagina = st.number_input("Página", min_value=1, max_value=total_paginas, step=1, key=f"{chave}_pagina")
+    inicio = (pagina - 1) * TAMANHO_PAGINA_ARMARIOS
+    pagina_opcoes = opcoes.iloc[inicio:inicio + TAMANHO_PAGINA_ARMARIOS]
+    if total_paginas > 1:
+        st.caption(f"Mostrando {inicio + 1}–{inicio + len(pagina_opcoes)} de {len(opcoes)} armários")
+    return pagina_opcoes['id_unico'].tolist(), dict(zip(pagina_opcoes['id_unico'], pagina_opcoes['rotulo']))
+
+# A página de diagnóstico só aparece com ?diagnostico=<token> na URL, e o
+# token deve ser igual à variável de ambiente ARMARIOS_ADMIN_TOKEN
+def acesso_diagnostico():
+    token = os.environ.get('ARMARIOS_ADMIN_TOKEN')
+    informado = st.query_params.get('diagnostico')
+    return bool(token) and informado is not None and hmac.compare_digest(informado.encode(), token.encode())
+
+# Registra a medição desta execução mesmo quando ela é interrompida por uma
+# nova interação (RerunException), por st.stop() ou por um erro
+registro = None
+opcao = None
+try:
+    # Aplica o CSS customizado do arquivo styles.css
+    with execucao.fase("css"):
+        try:
+            with open("styles.css") as f:
+                st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        except Exception as e:
+            st.warning(f"Não foi possível carregar o CSS customizado: {e}")
+
+    # Carrega as informações dos armários
+    with execucao.fase("carregar_dados_armarios"):
+        df_info_armarios = carregar_dados_armarios()
+
+    # Se conseguiu carregar as informações, inicializa os registros
+    if df_info_armarios is not None:
+        with execucao.fase("inicializar_registros"):
+            armazenamento = inicializar_registros(df_info_armarios)
+        with execucao.fase("obter_registro"):
+            historico = obter_historico()
+            registro = obter_registro_compartilhado(armazenamento, historico)
+
+        # API JSON no mesmo processo, compartilhando o registro em memória
+        if os.environ.get('ARMARIOS_API_PORTA'):
+            try:
+                iniciar_em_segundo_plano(int(os.environ['ARMARIOS_API_PORTA']))
+            except (OSError, ValueError) as e:
+                st.sidebar.warning(f"Não foi possível iniciar a API: {e}")
+
+        # Sidebar para navegação
+        st.sidebar.title("Navegação")
+        opcoes_menu = ["Visão Geral", "Alocar Armário", "Liberar Armário", "Importar em Lote", "Pesquisar", "Histórico"]
+        if acesso_diagnostico():
+            opcoes_menu.append("Diagnóstico")
+        opcao = st.sidebar.radio("Selecione uma opção:", opcoes_menu)
+
+        # Quem está operando o sistema, registrado no histórico de cada alteração
+        operador = st.sidebar.text_input("Operador", key="operador").strip().upper() or None
+
+        # O trecho da página escolhida é medido até o fim do script
+        execucao.iniciar_fase(f"pagina: {opcao}")
+
+        # Visão Geral
+        if opcao == "Visão Geral":
+            st.header("Visão Geral dos Armários")
+
+            # Estatísticas
+            contagem_status = registro.contar_por_status()
+            total_armarios = sum(contagem_status.values())
+            ocupados = contagem_status.get('Ocupado', 0)
+            disponiveis = total_armarios - ocupados
+
+            # Adicionar gráfico de pizza logo após o cabeçalho (imagem em cache por contagem)
+            with execucao.fase("graficos"):
+                st.image(criar_grafico_ocupacao(ocupados, disponiveis), width="stretch")
+
+            # Métricas em cards
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total de Armários", total_armarios)
+            col2.metric("Armários Ocupados", ocupados)
+            col3.metric("Armários Disponíveis", disponiveis)
+
+            # Ocupação por localização, a partir das contagens agregadas
+            with st.expander("Ocupação por localização"):
+                with execucao.fase("graficos"):
+                    st.image(criar_grafico_por_localizacao(registro.ocupacao_por_localizacao()), width="stretch")
+
+            # Filtros
+            st.subheader("Filtros")
+            col1, col2 = st.columns(2)
+            with col1:
+                filtro_status = st.selectbox(
+                    "Status",
+                    ["Todos", "Disponível", "Ocupado"]
+                )
+            with col2:
+                localizacoes = ["Todas"] + registro.localizacoes()
+                filtro_localizacao = st.selectbox("Localização", localizacoes)
+
+            # Aplicar filtros
+            df_filtrado = registro.consultar(
+                status=None if filtro_status == "Todos" else filtro_status,
+                localizacao=None if filtro_localizacao == "Todas" else filtro_localizacao
             )
 
-            if opcao_pesquisa == "Número do Armário":
-                # Cria opções de seleção sem mostrar o ID único
-                opcoes_armarios_display = [f"{row['numero']} - {row['localizacao']}" for _, row in df_ocupados.iterrows()]
-                # Dicionário para mapear a opção exibida para o ID único
-                mapa_opcoes_para_id = {f"{row['numero']} - {row['localizacao']}": row['id_unico'] for _, row in df_ocupados.iterrows()}
-
-                armario_selecionado_display = st.selectbox("Selecione o Armário", opcoes_armarios_display)
-
-                # Obter o ID único do armário selecionado usando o mapeamento
-                id_unico_selecionado = mapa_opcoes_para_id[armario_selecionado_display]
-
-                # Exibe informações do armário selecionado
-                armario_info = df_ocupados[df_ocupados['id_unico'] == id_unico_selecionado].iloc[0]
-                st.info(f"Armário {armario_info['numero']} - Localização: {armario_info['localizacao']}")
-                st.info(f"Ocupado por: {armario_info['nome']} - Turma: {armario_info['turma']}")
-
-                if st.button("Liberar este Armário"):
-                    # Atualiza o registro
-                    idx = df_registros[df_registros['id_unico'] == id_unico_selecionado].index[0]
-                    df_registros.at[idx, 'nome'] = ''
-                    df_registros.at[idx, 'turma'] = ''
-                    df_registros.at[idx, 'status'] = 'Disponível'
-                    df_registros.at[idx, 'data'] = ''
+            # Exibir tabela filtrada sem o id_unico e sem índice
+            colunas_exibir = [col for col in df_filtrado.columns if col not in COLUNAS_OCULTAS]
+            st.dataframe(df_filtrado[colunas_exibir], hide_index=True, column_config=CONFIG_COLUNAS)
 
-                    # Salva os registros atualizados
-                    salvar_registros(df_registros)
-
-                    st.success(f"Armário {armario_selecionado_display} liberado com sucesso!")
-
-            else:  # Pesquisa por nome
-                nome_pesquisa = st.text_input("Digite o nome do aluno")
+            # Adicionar link para download dos dados filtrados
+            if len(df_filtrado) > 0:
+                nome_arquivo = "armarios_visao_geral"
+                if filtro_status != "Todos":
+                    nome_arquivo += f"_{filtro_status.lower()}"
+                if filtro_localizacao != "Todas":
+                    nome_arquivo += f"_{filtro_localizacao.replace(' ', '_').lower()}"
 
-                if nome_pesquisa:
-                    # Converter para UPPER CASE para pesquisa
-                    nome_pesquisa = nome_pesquisa.upper()
+                gerar_link_download(df_filtrado[colunas_exibir], nome_arquivo, ('visao_geral', filtro_status, filtro_localizacao))
 
-                    # Filtra por nome (case insensitive e parcial)
-                    resultados = df_ocupados[df_ocupados['nome'].str.contains(nome_pesquisa, case=False)]
+        # Alocar Armário
+        elif opcao == "Alocar Armário":
+            st.header("Alocar Armário")
 
-                    if len(resultados) > 0:
-                        st.subheader("Resultados encontrados:")
-                        # Exibir resultados sem mostrar o ID único
-                        colunas_exibir = [col for col in resultados.columns if col != 'id_unico']
-                        st.dataframe(resultados[colunas_exibir], hide_index=True)
+            # Filtros para encontrar armários disponíveis
+            localizacoes = ["Todas"] + registro.localizacoes()
+            filtro_localizacao = st.selectbox("Localização", localizacoes)
 
-                        # Seleciona o armário a ser liberado sem mostrar o ID único
-                        opcoes_armarios_display = [f"{row['numero']} - {row['localizacao']}" for _, row in resultados.iterrows()]
-                        # Dicionário para mapear a opção exibida para o ID único
-                        mapa_opcoes_para_id = {f"{row['numero']} - {row['localizacao']}": row['id_unico'] for _, row in resultados.iterrows()}
+            # O armário pode ser escolhido automaticamente (menor número livre) ou da lista
+            modo_alocacao = st.radio("Escolha do armário", ["Próximo disponível", "Escolher da lista"], horizontal=True)
+            localizacoes_alocacao = None if filtro_localizacao == "Todas" else [filtro_localizacao]
 
-                        armario_selecionado_display = st.selectbox("Selecione o armário para liberar", opcoes_armarios_display)
+            if modo_alocacao == "Próximo disponível":
+                proximo = registro.proximo_livre(localizacoes_alocacao)
+                if proximo is None:
+                    st.warning("Não há armários disponíveis com os filtros selecionados.")
+                else:
+                    armario_info = registro.obter(proximo)
+                    st.info(f"Próximo armário disponível: {armario_info['numero']} - {armario_info['localizacao']}")
+
+                    with st.form("form_alocacao_automatica"):
+                        st.subheader("Dados do Aluno")
+                        nome_aluno = st.text_input("Nome do Aluno")
+                        turma_aluno = st.text_input("Turma")
+                        submitted = st.form_submit_button("Alocar Próximo Armário")
+
+                        if submitted:
+                            if nome_aluno and turma_aluno:
+                                # O armário é escolhido no momento da alocação: se o exibido foi
+                                # ocupado por outra sessão, o aluno recebe o seguinte
+                                try:
+                                    id_unico_alocado = registro.alocar_proximo(
+                                        nome_aluno, turma_aluno, localizacoes_alocacao, operador=operador
+                                    )
+                                    armario_info = registro.obter(id_unico_alocado)
+                                    st.success(f"Armário {armario_info['numero']} - {armario_info['localizacao']} alocado com sucesso para {nome_aluno.upper()}!")
+                                except ErroRegistro as e:
+                                    st.error(str(e))
+                            else:
+                                st.error("Por favor, preencha todos os campos.")
+
+            else:
+                # Armários disponíveis da página atual do seletor
+                ids_disponiveis, rotulos = pagina_seletor_armarios(
+                    'Disponível', "seletor_alocacao",
+                    None if filtro_localizacao == "Todas" else filtro_localizacao
+                )
+
+                if len(ids_disponiveis) > 0:
+                    # Formulário para alocação
+                    with st.form("form_alocacao"):
+                        st.subheader("Dados do Aluno")
+
+                        # Armário enviado pelo formulário: se foi ocupado por outra sessão,
+                        # ele some das opções, mas a alocação ainda deve se referir a ele
+                        armario_enviado = st.session_state.get("armario_alocacao")
+
+                        # Selecionar armário disponível - sem mostrar o ID único na interface
+                        id_unico_selecionado = st.selectbox(
+                            "Selecione o Armário", ids_disponiveis, format_func=rotulos.get, key="armario_alocacao"
+                        )
+
+                        # Dados do aluno
+                        nome_aluno = st.text_input("Nome do Aluno")
+                        turma_aluno = st.text_input("Turma")
+
+                        # Botão de submissão
+                        submitted = st.form_submit_button("Alocar Armário")
+
+                        if submitted:
+                            if nome_aluno and turma_aluno:
+                                # Converter dados para UPPER CASE
+                                nome_aluno = nome_aluno.upper()
+                                turma_aluno = turma_aluno.upper()
+
+                                if armario_enviado in registro:
+                                    id_unico_selecionado = armario_enviado
+                                armario_info = registro.obter(id_unico_selecionado)
+                                armario_selecionado_display = f"{armario_info['numero']} - {armario_info['localizacao']}"
+
+                                # Atualiza o registro (falha se o armário foi ocupado nesse meio-tempo)
+                                try:
+                                    registro.alocar(id_unico_selecionado, nome_aluno, turma_aluno, operador=operador)
+                                    st.success(f"Armário {armario_selecionado_display} alocado com sucesso para {nome_aluno}!")
+                                except ErroRegistro as e:
+                                    st.error(str(e))
+                            else:
+                                st.error("Por favor, preencha todos os campos.")
+                else:
+                    st.warning("Não há armários disponíveis com os filtros selecionados.")
+
+        # Liberar Armário
+        elif opcao == "Liberar Armário":
+            st.header("Liberar Armário")
+
+            if registro.contar_por_status().get('Ocupado', 0) > 0:
+                # Opções para pesquisar o armário a ser liberado
+                opcao_pesquisa = st.radio(
+                    "Pesquisar por:",
+                    ["Número do Armário", "Nome do Aluno"]
+                )
+
+                if opcao_pesquisa == "Número do Armário":
+                    ids_ocupados, rotulos = pagina_seletor_armarios('Ocupado', "seletor_liberacao")
+                    if not ids_ocupados:
+                        st.warning("Nenhum armário ocupado com o número informado.")
+                    else:
+                        # Seleção sem mostrar o ID único
+                        id_unico_selecionado = st.selectbox("Selecione o Armário", ids_ocupados, format_func=rotulos.get)
+                        armario_selecionado_display = rotulos[id_unico_selecionado]
 
-                        # Obter o ID único do armário selecionado usando o mapeamento
-                        id_unico_selecionado = mapa_opcoes_para_id[armario_selecionado_display]
+                        # Exibe informações do armário selecionado
+                        armario_info = registro.obter(id_unico_selecionado)
+                        st.info(f"Armário {armario_info['numero']} - Localização: {armario_info['localizacao']}")
+                        st.info(f"Ocupado por: {armario_info['nome']} - Turma: {armario_info['turma']}")
+                        id_exibido, versao_exibida = armario_exibido("liberacao_por_numero", id_unico_selecionado)
 
-                        if st.button("Liberar Armário Selecionado"):
+                        if st.button("Liberar este Armário"):
                             # Atualiza o registro
-                            idx = df_registros[df_registros['id_unico'] == id_unico_selecionado].index[0]
-                            df_registros.at[idx, 'nome'] = ''
-                            df_registros.at[idx, 'turma'] = ''
-                            df_registros.at[idx, 'status'] = 'Disponível'
-                            df_registros.at[idx, 'data'] = ''
-
-                            # Salva os registros atualizados
-                            salvar_registros(df_registros)
-
-                            st.success(f"Armário {armario_selecionado_display} liberado com sucesso!")
+                            try:
+                                registro.liberar(id_exibido, versao_esperada=versao_exibida, operador=operador)
+                                st.success(f"Armário {rotulos.get(id_exibido, armario_selecionado_display)} liberado com sucesso!")
+                            except ErroRegistro as e:
+                                st.error(str(e))
+
+                else:  # Pesquisa por nome
+                    nome_pesquisa = st.text_input("Digite o nome do aluno")
+
+                    if nome_pesquisa:
+                        # Converter para UPPER CASE para pesquisa
+                        nome_pesquisa = nome_pesquisa.upper()
+
+                        # Filtra por nome (parcial, sem diferenciar maiúsculas e acentos)
+                        resultados = registro.buscar('nome', nome_pesquisa, status='Ocupado')
+
+                        if len(resultados) > 0:
+                            st.subheader("Resultados encontrados:")
+                            # Exibir resultados sem mostrar o ID único
+                            colunas_exibir = [col for col in resultados.columns if col not in COLUNAS_OCULTAS]
+                            st.dataframe(resultados[colunas_exibir], hide_index=True, column_config=CONFIG_COLUNAS)
+
+                            # Seleciona o armário a ser liberado sem mostrar o ID único
+                            # (apenas os melhores resultados, para manter a lista curta)
+                            melhores = resultados.head(TAMANHO_PAGINA_ARMARIOS)
+                            rotulos = dict(zip(melhores['id_unico'], rotulos_armarios(melhores)))
+                            id_unico_selecionado = st.selectbox(
+                                "Selecione o armário para liberar", list(rotulos), format_func=rotulos.get
+                            )
+                            armario_selecionado_display = rotulos[id_unico_selecionado]
+                            id_exibido, versao_exibida = armario_exibido("liberacao_por_nome", id_unico_selecionado)
+
+                            if st.button("Liberar Armário Selecionado"):
+                                # Atualiza o registro
+                                try:
+                                    registro.liberar(id_exibido, versao_esperada=versao_exibida, operador=operador)
+                                    st.success(f"Armário {rotulos.get(id_exibido, armario_selecionado_display)} liberado com sucesso!")
+                                except ErroRegistro as e:
+                                    st.error(str(e))
+                        else:
+                            st.warning(f"Nenhum aluno encontrado com o nome '{nome_pesquisa}'.")
+            else:
+                st.info("Não há armários ocupados no momento.")
+
+        # Importar em Lote
+        elif opcao == "Importar em Lote":
+            st.header("Importar Alocações ou Liberações em Lote")
+
+            operacao_lote = st.radio("Operação:", ["Alocar", "Liberar", "Atribuir automaticamente"])
+            if operacao_lote == "Alocar":
+                st.info("O arquivo deve ter as colunas id_unico (ou numero e localizacao), nome e turma.")
+            elif operacao_lote == "Liberar":
+                st.info("O arquivo deve ter a coluna id_unico (ou as colunas numero e localizacao).")
+            else:
+                st.info(
+                    "O arquivo deve ter as colunas nome e turma, e opcionalmente localizacao (localização preferida). "
+                    "Cada aluno recebe o armário livre de menor número na localização preferida ou, sem ela, "
+                    "na localização da sua turma definida abaixo."
+                )
+
+            arquivo_lote = st.file_uploader("Arquivo CSV ou Excel", type=["csv", "xlsx"])
+            if operacao_lote == "Atribuir automaticamente":
+                # Política turma -> localização; várias linhas da mesma turma definem a ordem de preferência
+                tabela_politica = st.data_editor(
+                    pd.DataFrame({'turma': pd.Series(dtype=str), 'localizacao': pd.Series(dtype=str)}),
+                    num_rows="dynamic",
+                    column_config={
+                        'turma': st.column_config.TextColumn("Turma"),
+                        'localizacao': st.column_config.SelectboxColumn("Localização", options=registro.localizacoes())
+                    },
+                    key="politica_atribuicao"
+                )
+                qualquer_localizacao = st.checkbox("Se a localização estiver cheia, usar outra", value=True)
+            else:
+                tudo_ou_nada = st.checkbox("Aplicar somente se todas as linhas forem válidas")
+
+            if arquivo_lote is not None and st.button("Processar arquivo"):
+                try:
+                    lote = ler_arquivo_lote(arquivo_lote)
+                except Exception as e:
+                    st.error(f"Não foi possível ler o arquivo: {e}")
+                else:
+                    if operacao_lote == "Atribuir automaticamente":
+                        relatorio = registro.atribuir_lote(
+                            lote, politica_de_tabela(tabela_politica), qualquer_localizacao, operador=operador
+                        )
+                        aplicadas = relatorio['id_unico'].notna().sum()
                     else:
-                        st.warning(f"Nenhum aluno encontrado com o nome '{nome_pesquisa}'.")
-        else:
-            st.info("Não há armários ocupados no momento.")
-
-    # Pesquisar
-    elif opcao == "Pesquisar":
-        st.header("Pesquisar Armários")
-
-        # Opções de pesquisa
-        opcao_pesquisa = st.radio(
-            "Pesquisar por:",
-            ["Número do Armário", "Nome do Aluno", "Turma"]
-        )
+                        relatorio = registro.importar_lote(lote, operacao_lote.lower(), tudo_ou_nada, operador=operador)
+                        aplicadas = relatorio['resultado'].isin(['Alocado', 'Liberado']).sum()
 
-        if opcao_pesquisa == "Número do Armário":
-            numero_pesquisa = st.number_input("Digite o número do armário", min_value=1, step=1)
+                    col1, col2 = st.columns(2)
+                    col1.metric("Linhas aplicadas", int(aplicadas))
+                    col2.metric("Linhas com erro", len(relatorio) - int(aplicadas))
 
-            # Botão de pesquisa sempre visível
-            if st.button("Pesquisar"):
-                # Filtrar apenas armários ocupados com o número especificado
-                resultado = df_registros[(df_registros['numero'] == numero_pesquisa) &
-                                        (df_registros['status'] == 'Ocupado')]
+                    st.subheader("Resultado por linha")
+                    st.dataframe(relatorio, hide_index=True)
+                    gerar_link_download(relatorio, f"resultado_lote_{operacao_lote.split()[0].lower()}")
 
-                if len(resultado) > 0:
-                    st.subheader("Resultados encontrados:")
-                    # Exibir resultados sem o ID único e sem índice
-                    colunas_exibir = [col for col in resultado.columns if col != 'id_unico']
-                    st.dataframe(resultado[colunas_exibir], hide_index=True)
+        # Pesquisar
+        elif opcao == "Pesquisar":
+            st.header("Pesquisar Armários")
 
-                    # Adicionar link para download dos resultados
-                    gerar_link_download_excel(resultado[colunas_exibir], f"armarios_numero_{numero_pesquisa}")
-
-                    # Se houver mais de um armário com o mesmo número, mostra uma mensagem
-                    if len(resultado) > 1:
-                        st.info(f"Foram encontrados {len(resultado)} armários ocupados com o número {numero_pesquisa} em diferentes localizações.")
-                else:
-                    st.warning(f"Nenhum armário ocupado com o número {numero_pesquisa} foi encontrado.")
-
-        elif opcao_pesquisa == "Nome do Aluno":
-            # Campo de entrada para o nome do aluno
-            nome_pesquisa = st.text_input("Digite o nome do aluno")
-
-            # Botão de pesquisa sempre visível, independente do preenchimento do campo
-            botao_pesquisar = st.button("Pesquisar")
+            # Opções de pesquisa
+            opcao_pesquisa = st.radio(
+                "Pesquisar por:",
+                ["Número do Armário", "Nome do Aluno", "Turma"]
+            )
 
-            # Executa a pesquisa quando o botão for clicado e houver texto no campo
-            if botao_pesquisar:
-                if nome_pesquisa:
-                    # Converter para UPPER CASE para pesquisa
-                    nome_pesquisa = nome_pesquisa.upper()
+            if opcao_pesquisa == "Número do Armário":
+                numero_pesquisa = st.number_input("Digite o número do armário", min_value=1, step=1)
 
-                    resultados = df_registros[df_registros['nome'].fillna('').str.contains(nome_pesquisa, case=False)]
+                # Botão de pesquisa sempre visível
+                if st.button("Pesquisar"):
+                    # Filtrar apenas armários ocupados com o número especificado
+                    resultado = registro.consultar(numero=numero_pesquisa, status='Ocupado')
 
-                    if len(resultados) > 0:
+                    if len(resultado) > 0:
                         st.subheader("Resultados encontrados:")
                         # Exibir resultados sem o ID único e sem índice
-                        colunas_exibir = [col for col in resultados.columns if col != 'id_unico']
-                        st.dataframe(resultados[colunas_exibir], hide_index=True)
+                        colunas_exibir = [col for col in resultado.columns if col not in COLUNAS_OCULTAS]
+                        st.dataframe(resultado[colunas_exibir], hide_index=True, column_config=CONFIG_COLUNAS)
 
                         # Adicionar link para download dos resultados
-                        nome_arquivo = f"armarios_aluno_{nome_pesquisa.replace(' ', '_').lower()}"
-                        gerar_link_download_excel(resultados[colunas_exibir], nome_arquivo)
+                        gerar_link_download(resultado[colunas_exibir], f"armarios_numero_{numero_pesquisa}", ('numero', numero_pesquisa))
+
+                        # Se houver mais de um armário com o mesmo número, mostra uma mensagem
+                        if len(resultado) > 1:
+                            st.info(f"Foram encontrados {len(resultado)} armários ocupados com o número {numero_pesquisa} em diferentes localizações.")
                     else:
-                        st.warning(f"Nenhum aluno encontrado com o nome '{nome_pesquisa}'.")
-                else:
-                    st.warning("Por favor, digite um nome para pesquisar.")
+                        st.warning(f"Nenhum armário ocupado com o número {numero_pesquisa} foi encontrado.")
 
-        else:  # Pesquisa por turma
-            # Campo de entrada para a turma
-            turma_pesquisa = st.text_input("Digite a turma")
+            elif opcao_pesquisa == "Nome do Aluno":
+                # Campo de entrada para o nome do aluno
+                nome_pesquisa = st.text_input("Digite o nome do aluno")
 
-            # Botão de pesquisa sempre visível, independente do preenchimento do campo
-            botao_pesquisar = st.button("Pesquisar")
+                # Botão de pesquisa sempre visível, independente do preenchimento do campo
+                botao_pesquisar = st.button("Pesquisar")
 
-            # Executa a pesquisa quando o botão for clicado e houver texto no campo
-            if botao_pesquisar:
-                if turma_pesquisa:
-                    # Converter para UPPER CASE para pesquisa
-                    turma_pesquisa = turma_pesquisa.upper()
+                # Executa a pesquisa quando o botão for clicado e houver texto no campo
+                if botao_pesquisar:
+                    if nome_pesquisa:
+                        # Converter para UPPER CASE para pesquisa
+                        nome_pesquisa = nome_pesquisa.upper()
 
-                    resultados = df_registros[df_registros['turma'].fillna('').str.contains(turma_pesquisa, case=False)]
+                        resultados = registro.buscar('nome', nome_pesquisa)
 
-                    if len(resultados) > 0:
-                        st.subheader("Resultados encontrados:")
-                        # Exibir resultados sem o ID único e sem índice
-                        colunas_exibir = [col for col in resultados.columns if col != 'id_unico']
-                        st.dataframe(resultados[colunas_exibir], hide_index=True)
+                        if len(resultados) > 0:
+                            st.subheader("Resultados encontrados:")
+                            # Exibir resultados sem o ID único e sem índice
+                            colunas_exibir = [col for col in resultados.columns if col not in COLUNAS_OCULTAS]
+                            st.dataframe(resultados[colunas_exibir], hide_index=True, column_config=CONFIG_COLUNAS)
 
-                        # Adicionar link para download dos resultados
-                        nome_arquivo = f"armarios_turma_{turma_pesquisa.replace(' ', '_').lower()}"
-                        gerar_link_download_excel(resultados[colunas_exibir], nome_arquivo)
+                            # Adicionar link para download dos resultados
+                            nome_arquivo = f"armarios_aluno_{nome_pesquisa.replace(' ', '_').lower()}"
+                            gerar_link_download(resultados[colunas_exibir], nome_arquivo, ('nome', nome_pesquisa))
+                        else:
+                            st.warning(f"Nenhum aluno encontrado com o nome '{nome_pesquisa}'.")
+                    else:
+                        st.warning("Por favor, digite um nome para pesquisar.")
+
+            else:  # Pesquisa por turma
+                # Campo de entrada para a turma
+                turma_pesquisa = st.text_input("Digite a turma")
+
+                # Botão de pesquisa sempre visível, independente do preenchimento do campo
+                botao_pesquisar = st.button("Pesquisar")
+
+                # Executa a pesquisa quando o botão for clicado e houver texto no campo
+                if botao_pesquisar:
+                    if turma_pesquisa:
+                        # Converter para UPPER CASE para pesquisa
+                        turma_pesquisa = turma_pesquisa.upper()
+
+                        resultados = registro.buscar('turma', turma_pesquisa)
+
+                        if len(resultados) > 0:
+                            st.subheader("Resultados encontrados:")
+                            # Exibir resultados sem o ID único e sem índice
+                            colunas_exibir = [col for col in resultados.columns if col not in COLUNAS_OCULTAS]
+                            st.dataframe(resultados[colunas_exibir], hide_index=True, column_config=CONFIG_COLUNAS)
+
+                            # Adicionar link para download dos resultados
+                            nome_arquivo = f"armarios_turma_{turma_pesquisa.replace(' ', '_').lower()}"
+                            gerar_link_download(resultados[colunas_exibir], nome_arquivo, ('turma', turma_pesquisa))
+                        else:
+                            st.warning(f"Nenhum aluno encontrado na turma '{turma_pesquisa}'.")
                     else:
-                        st.warning(f"Nenhum aluno encontrado na turma '{turma_pesquisa}'.")
+                        st.warning("Por favor, digite uma turma para pesquisar.")
+
+        # Histórico de alocações e liberações
+        elif opcao == "Histórico":
+            st.header("Histórico de Alocações e Liberações")
+
+            # Grava os eventos ainda pendentes, para que as últimas operações apareçam
+            try:
+                registro.descarregar()
+            except Exception as e:
+                st.error(f"Erro ao gravar o histórico: {e}")
+
+            hoje = datetime.date.today()
+            col1, col2 = st.columns(2)
+            with col1:
+                periodo = st.date_input("Período", (hoje - datetime.timedelta(days=30), hoje), max_value=hoje)
+            with col2:
+                localizacao_historico = st.selectbox("Localização", ["Todas"] + registro.localizacoes())
+
+            # O período pode ter só a data inicial enquanto o usuário escolhe a final
+            inicio = periodo[0] if periodo else hoje
+            fim = periodo[-1] if periodo else hoje
+            inicio = pd.Timestamp(inicio)
+            fim = pd.Timestamp(fim) + pd.Timedelta(days=1)
+            localizacao_filtro = None if localizacao_historico == "Todas" else localizacao_historico
+
+            eventos = historico.consultar(inicio, fim, localizacao=localizacao_filtro)
+            if len(eventos) > 0:
+                eventos['evento'] = eventos['evento'].map({EVENTO_ALOCACAO: 'Alocação', EVENTO_LIBERACAO: 'Liberação'})
+                st.dataframe(eventos.drop(columns='id_unico'), hide_index=True)
+
+                st.subheader("Liberações por semana")
+                liberacoes = historico.eventos_por_semana(EVENTO_LIBERACAO, inicio, fim)
+                if localizacao_filtro is not None:
+                    liberacoes = liberacoes[[localizacao_filtro]] if localizacao_filtro in liberacoes.columns else liberacoes.iloc[:, 0:0]
+                if liberacoes.empty or liberacoes.to_numpy().sum() == 0:
+                    st.info("Nenhuma liberação no período.")
                 else:
-                    st.warning("Por favor, digite uma turma para pesquisar.")
-else:
-    st.error("Não foi possível carregar as informações dos armários. Verifique se o arquivo 'armarios.xlsx' existe e está no formato correto.")
-
-    # Exibe o formato esperado da planilha
-    st.info("""
-    O arquivo 'armarios.xlsx' deve conter as seguintes colunas:
-    - Localização: local onde os armários estão (ex: Bloco A, Andar 2, etc)
-    - Início: número do primeiro armário da faixa
-    - Fim: número do último armário da faixa
-
-    Exemplo:
-    | Localização | Início | Fim |
-    |----|----|----|
-    | Bloco A    | 1    | 50  |
-    | Bloco B    | 51    | 100 |
-    """)
\ No newline at end of file
+                    st.bar_chart(liberacoes)
+            else:
+                st.info("Nenhuma alocação ou liberação registrada no período.")
+
+            # Ocupantes de um armário no período escolhido acima
+            st.subheader("Quem ocupou um armário no período")
+            col1, col2 = st.columns(2)
+            with col1:
+                localizacao_armario = st.selectbox("Localização do armário", registro.localizacoes(), key="historico_localizacao")
+            with col2:
+                numero_armario = st.number_input("Número do armário", min_value=1, step=1, key="historico_numero")
+
+            armario = registro.consultar(localizacao=localizacao_armario, numero=numero_armario)
+            if len(armario) == 0:
+                st.warning(f"Armário {numero_armario} não encontrado em {localizacao_armario}.")
+            else:
+                ocupantes = historico.ocupantes(armario['id_unico'].iloc[0], inicio, fim)
+                if len(ocupantes) > 0:
+                    st.dataframe(ocupantes, hide_index=True)
+                else:
+                    st.info("Nenhuma alocação registrada para este armário no período.")
+        # Diagnóstico de desempenho (página oculta, ver acesso_diagnostico)
+        elif opcao == "Diagnóstico":
+            st.header("Diagnóstico de Desempenho")
+
+            col1, col2, col3, col4 = st.columns(4)
+            memoria_atual = memoria_atual_mb()
+            memoria_pico = memoria_pico_mb()
+            col1.metric("Memória do processo", f"{memoria_atual:.0f} MB" if memoria_atual is not None else "-")
+            col2.metric("Pico de memória", f"{memoria_pico:.0f} MB" if memoria_pico is not None else "-")
+            col3.metric("Armários no cadastro", len(registro))
+            col4.metric("Memória do cadastro", f"{registro.df.memory_usage(deep=True).sum() / (1024 * 1024):.1f} MB")
+
+            execucoes = diagnostico.execucoes()
+            if execucoes:
+                st.subheader("Tempo por fase")
+                st.caption(
+                    f"Últimas {len(execucoes)} execuções deste processo. As fases de gráficos fazem "
+                    "parte da fase da página; as exportações são medidas quando o arquivo é baixado."
+                )
+                st.dataframe(
+                    diagnostico.resumo(),
+                    hide_index=True,
+                    column_config={
+                        coluna: st.column_config.NumberColumn(format="%.1f")
+                        for coluna in ('p50_ms', 'p95_ms', 'max_ms')
+                    }
+                )
+
+                recentes = pd.DataFrame(execucoes)
+                recentes['momento'] = pd.to_datetime(recentes['momento'], unit='s', utc=True).dt.tz_convert(None)
+                recentes['total_ms'] = recentes['total_s'] * 1000
+                st.subheader("Execuções recentes")
+                st.line_chart(recentes[recentes['tipo'] == 'execucao'], x='momento', y='total_ms')
+                colunas_recentes = [coluna for coluna in ('momento', 'tipo', 'pagina', 'total_ms', 'memoria_mb', 'armarios')
+                                    if coluna in recentes.columns]
+                st.dataframe(recentes[colunas_recentes].iloc[::-1].head(50), hide_index=True)
+            else:
+                st.info("Nenhuma execução medida ainda.")
+
+            if st.button("Limpar medições"):
+                diagnostico.limpar()
+                st.success("Medições apagadas.")
+
+    else:
+        st.error("Não foi possível carregar as informações dos armários. Verifique se o arquivo 'armarios.xlsx' existe e está no formato correto.")
+
+        # Exibe o formato esperado da planilha
+        st.info("""
+        O arquivo 'armarios.xlsx' deve conter as seguintes colunas:
+        - Localização: local onde os armários estão (ex: Bloco A, Andar 2, etc)
+        - Início: número do primeiro armário da faixa
+        - Fim: número do último armário da faixa
+
+        Exemplo:
+        | Localização | Início | Fim |
+        |----|----|----|
+        | Bloco A    | 1    | 50  |
+        | Bloco B    | 51    | 100 |
+        """)
+finally:
+    execucao.concluir(pagina=opcao, armarios=len(registro) if registro is not None else None)
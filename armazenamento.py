@@ -0,0 +1,578 @@
+import os
+import sys
+import json
+import datetime
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # Indisponível no Windows; a trava passa a valer só dentro do processo
+    fcntl = None
+
+# No Windows, os.open abre em modo texto (e troca \n por \r\n) sem O_BINARY
+O_BINARIO = getattr(os, 'O_BINARY', 0)
+
+# Arquivos de dados do cadastro de armários
+ARQUIVO_REGISTROS = 'registros_armarios.csv'
+ARQUIVO_JOURNAL = 'registros_armarios.journal'
+ARQUIVO_SQLITE = 'registros_armarios.db'
+
+# Tamanho do journal (em bytes) a partir do qual ele é incorporado ao CSV de registros
+LIMITE_JOURNAL_BYTES = 256 * 1024
+
+# Colunas do cadastro de armários
+COLUNAS_REGISTROS = ['id_unico', 'numero', 'localizacao', 'nome', 'turma', 'status', 'data']
+
+# Valores gravados em um armário quando ele é liberado
+CAMPOS_ARMARIO_LIVRE = {'nome': '', 'turma': '', 'status': 'Disponível', 'data': ''}
+
+# Formato da coluna data nos arquivos
+FORMATO_DATA = '%d-%m-%Y'
+
+# Status possíveis de um armário, na ordem das categorias em memória
+STATUS_ARMARIO = ['Disponível', 'Ocupado']
+
+# Colunas guardadas como categorias em memória: poucos valores distintos,
+# repetidos em muitos armários
+COLUNAS_CATEGORICAS = ('localizacao', 'turma', 'status')
+
+# Gera o ID único de cada armário (localização sem espaços e caracteres
+# especiais, em maiúsculas, mais o número com 4 dígitos, ex.: CORREDOR1ANDAR-0012).
+# A localização formatada é calculada uma vez por localização distinta, e não por armário
+def gerar_ids_unicos(numeros, localizacoes):
+    localizacoes = pd.Series(localizacoes).reset_index(drop=True)
+    numeros = pd.Series(numeros).reset_index(drop=True).astype('int64')
+    formatadas = {
+        localizacao: ''.join(e for e in localizacao if e.isalnum()).upper()
+        for localizacao in localizacoes.unique()
+    }
+    return localizacoes.map(formatadas) + '-' + numeros.astype(str).str.zfill(4)
+
+# Preenche a coluna id_unico em cadastros antigos que ainda não a possuem
+def preencher_id_unico(df):
+    if 'id_unico' not in df.columns and len(df) > 0:
+        df['id_unico'] = gerar_ids_unicos(df['numero'], df['localizacao']).to_numpy()
+    return df
+
+# Expande as faixas da planilha de armários (Localização, Início, Fim) em um
+# registro disponível por armário, sem laços em Python
+def expandir_faixas(df_info):
+    inicios = df_info['Início'].astype('int64').to_numpy()
+    fins = df_info['Fim'].astype('int64').to_numpy()
+    tamanhos = np.maximum(fins - inicios + 1, 0)
+    # Posição de cada armário dentro da sua faixa: 0, 1, 2, ... reiniciando a cada faixa
+    deslocamentos = np.arange(tamanhos.sum()) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+    numeros = np.repeat(inicios, tamanhos) + deslocamentos
+    localizacoes = np.repeat(df_info['Localização'].to_numpy(), tamanhos)
+    armarios = pd.DataFrame({
+        'id_unico': gerar_ids_unicos(numeros, localizacoes).to_numpy(),
+        'numero': numeros,
+        'localizacao': localizacoes,
+        'nome': '',
+        'turma': '',
+        'status': 'Disponível',
+        'data': ''
+    })
+    # Faixas sobrepostas na planilha não geram armários repetidos
+    return armarios.drop_duplicates('id_unico', ignore_index=True)
+
+# Converte o cadastro lido dos arquivos para o esquema em memória: chave
+# inteira (posição do armário no cadastro) ao lado do id_unico, numero como
+# int32, localizacao/turma/status como categorias e data como datetime.
+# Valores vazios viram ausentes (NaN/NaT).
+def aplicar_esquema(df):
+    df = df.reindex(columns=COLUNAS_REGISTROS)
+    tipado = pd.DataFrame({
+        'chave': np.arange(len(df), dtype='int32'),
+        'id_unico': df['id_unico'].astype(object).to_numpy(),
+        'numero': pd.to_numeric(df['numero'], errors='coerce').fillna(0).astype('int32').to_numpy(),
+        'nome': df['nome'].replace('', np.nan).astype(object).to_numpy(),
+    })
+    for coluna in COLUNAS_CATEGORICAS:
+        valores = df[coluna].replace('', np.nan)
+        # Categorias na ordem em que aparecem (a ordem das localizações é a da planilha)
+        categorias = pd.unique(valores.dropna())
+        if coluna == 'status':
+            categorias = STATUS_ARMARIO + [status for status in categorias if status not in STATUS_ARMARIO]
+        tipado[coluna] = pd.Categorical(valores, categories=categorias)
+    tipado['data'] = pd.to_datetime(df['data'].replace('', np.nan), format=FORMATO_DATA, errors='coerce').to_numpy()
+    return tipado[['chave'] + COLUNAS_REGISTROS]
+
+# Converte o cadastro em memória de volta para o formato dos arquivos: sem a
+# chave, com textos simples e datas em FORMATO_DATA
+def formatar_para_gravacao(df):
+    df = df.reindex(columns=COLUNAS_REGISTROS)
+    if pd.api.types.is_datetime64_any_dtype(df['data']):
+        df = df.assign(data=df['data'].dt.strftime(FORMATO_DATA))
+    for coluna in COLUNAS_CATEGORICAS:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df = df.assign(**{coluna: df[coluna].astype(object)})
+    return df
+
+# Converte os campos de uma alteração (no formato dos arquivos, como são
+# gravados no journal) para os tipos do esquema em memória. Valores novos em
+# colunas categóricas (uma turma nova, por exemplo) são acrescentados às
+# categorias do DataFrame.
+def converter_campos(df, campos):
+    convertidos = {}
+    for coluna, valor in campos.items():
+        if valor == '' or valor is None:
+            valor = pd.NaT if coluna == 'data' else np.nan
+        elif coluna == 'data':
+            # strptime é bem mais rápido que pd.to_datetime para um único valor
+            valor = pd.Timestamp(datetime.datetime.strptime(valor, FORMATO_DATA))
+        elif coluna in COLUNAS_CATEGORICAS and valor not in df[coluna].cat.categories:
+            df[coluna] = df[coluna].cat.add_categories([valor])
+        convertidos[coluna] = valor
+    return convertidos
+
+# Função para obter a assinatura (mtime e tamanho) de um arquivo, usada como chave de cache
+def assinatura_arquivo(caminho):
+    stat = os.stat(caminho)
+    return stat.st_mtime_ns, stat.st_size
+
+# Cache de arquivos lidos, compartilhado por todas as sessões do processo:
+# caminho -> (assinatura, conteúdo)
+_cache_arquivos = {}
+
+# Lê um arquivo com a função informada, reaproveitando o resultado enquanto o
+# caminho, o mtime e o tamanho do arquivo não mudarem. O conteúdo devolvido é
+# compartilhado e não deve ser alterado por quem chama.
+def ler_com_cache(caminho, leitor):
+    assinatura = assinatura_arquivo(caminho)
+    em_cache = _cache_arquivos.get(caminho)
+    if em_cache is None or em_cache[0] != assinatura:
+        em_cache = (assinatura, leitor(caminho))
+        _cache_arquivos[caminho] = em_cache
+    return em_cache[1]
+
+# Remove um arquivo do cache; usado após gravações, pois em sistemas de arquivos
+# com mtime de baixa resolução a assinatura pode não mudar entre duas gravações
+def invalidar_cache(caminho):
+    _cache_arquivos.pop(caminho, None)
+
+# Lê o CSV de registros
+def _ler_csv_registros(caminho):
+    # As colunas de texto são lidas como texto mesmo quando estão todas vazias,
+    # para que as alterações do journal possam gravar nomes nelas
+    df = pd.read_csv(caminho, dtype={'nome': str, 'turma': str, 'data': str})
+    # Converte a coluna 'numero' para inteiro se não for nulo
+    if 'numero' in df.columns:
+        df['numero'] = pd.to_numeric(df['numero'], errors='coerce').fillna(0).astype(int)
+    return preencher_id_unico(df)
+
+# Lê o journal de alterações: cada linha é um JSON com o id_unico e os campos
+# alterados, ou um lote inteiro em 'alteracoes' (gravado em uma única linha
+# para que o lote seja aplicado por completo ou descartado)
+def _ler_journal(caminho):
+    alteracoes = []
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            try:
+                entrada = json.loads(linha)
+            except json.JSONDecodeError:
+                # Linha incompleta de uma gravação interrompida: é descartada, e as
+                # alterações gravadas depois dela continuam valendo
+                continue
+            if 'alteracoes' in entrada:
+                alteracoes.extend(entrada['alteracoes'])
+            else:
+                alteracoes.append(entrada)
+    return alteracoes
+
+# Aplica as alterações do journal sobre o snapshot carregado do CSV
+def aplicar_journal(df, alteracoes):
+    if not alteracoes or len(df) == 0:
+        return df
+    # Mantém apenas o último estado de cada armário (as alterações gravam valores absolutos)
+    ultimo_estado = {}
+    for alteracao in alteracoes:
+        ultimo_estado.setdefault(alteracao['id_unico'], {}).update(alteracao['campos'])
+    posicoes = pd.Index(df['id_unico']).get_indexer(list(ultimo_estado))
+    for posicao, campos in zip(posicoes, ultimo_estado.values()):
+        if posicao < 0:
+            continue
+        for coluna, valor in campos.items():
+            df.iat[posicao, df.columns.get_loc(coluna)] = valor
+    return df
+
+# Linhas cujo texto contém o trecho (sem diferenciar maiúsculas). Em colunas
+# categóricas a busca é feita uma vez por categoria, e não por linha.
+def _contem(coluna, texto):
+    if isinstance(coluna.dtype, pd.CategoricalDtype):
+        categorias = coluna.cat.categories
+        return coluna.isin(categorias[categorias.astype(str).str.contains(texto, case=False, regex=False)])
+    return coluna.fillna('').str.contains(texto, case=False, regex=False)
+
+# Filtra o cadastro em memória; data_inicio e data_fim (inclusive) filtram pela
+# data de alocação (a coluna data já convertida por aplicar_esquema)
+def filtrar_registros(df, status=None, localizacao=None, numero=None, nome=None, turma=None,
+                      data_inicio=None, data_fim=None):
+    mascara = pd.Series(True, index=df.index)
+    if status is not None:
+        mascara &= df['status'] == status
+    if localizacao is not None:
+        mascara &= df['localizacao'] == localizacao
+    if numero is not None:
+        mascara &= df['numero'] == numero
+    if nome:
+        mascara &= _contem(df['nome'], nome)
+    if turma:
+        mascara &= _contem(df['turma'], turma)
+    if data_inicio is not None:
+        mascara &= df['data'] >= pd.Timestamp(data_inicio)
+    if data_fim is not None:
+        mascara &= df['data'] <= pd.Timestamp(data_fim)
+    return df[mascara]
+
+
+# Se o journal não termina em quebra de linha, a última gravação foi interrompida
+# (e nunca confirmada): corta o arquivo de volta até a última linha completa, para
+# que a próxima alteração não seja colada ao trecho incompleto
+def _descartar_linha_incompleta(fd):
+    tamanho = os.fstat(fd).st_size
+    if tamanho == 0 or _ler_trecho(fd, tamanho - 1, 1) == b'\n':
+        return
+    fim = tamanho
+    while fim > 0:
+        inicio = max(0, fim - 64 * 1024)
+        quebra = _ler_trecho(fd, inicio, fim - inicio).rfind(b'\n')
+        if quebra >= 0:
+            os.ftruncate(fd, inicio + quebra + 1)
+            return
+        fim = inicio
+    os.ftruncate(fd, 0)
+
+# Lê tamanho bytes a partir da posição (os.pread não existe no Windows). Com
+# O_APPEND as escritas continuam indo para o fim, qualquer que seja a posição.
+def _ler_trecho(fd, posicao, tamanho):
+    os.lseek(fd, posicao, os.SEEK_SET)
+    return os.read(fd, tamanho)
+
+
+# Trava de escrita do cadastro, válida entre threads e entre processos (flock em
+# um arquivo ao lado dos dados). Quem a detém é o único que grava: o registro em
+# memória a adquire antes de alterar um armário e só a solta depois de gravar
+# a alteração, então a interface, a API em outro processo e a linha de comando
+# não confirmam alterações conflitantes. Pode ser solta por outra thread.
+class TravaEntreProcessos:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self._fd = None
+
+    def adquirir(self):
+        self._trava.acquire()
+        try:
+            self._fd = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._trava.release()
+            raise
+
+    def liberar(self):
+        # Fechar o arquivo solta o flock
+        os.close(self._fd)
+        self._fd = None
+        self._trava.release()
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *excecao):
+        self.liberar()
+
+
+# Armazenamento em CSV: snapshot completo + journal de alterações
+class ArmazenamentoCSV:
+    def __init__(self, caminho=ARQUIVO_REGISTROS, caminho_journal=ARQUIVO_JOURNAL,
+                 limite_journal=LIMITE_JOURNAL_BYTES):
+        self.caminho = caminho
+        self.caminho_journal = caminho_journal
+        self.limite_journal = limite_journal
+        # Serializa escritas no journal e compactações entre as sessões
+        self._trava = threading.Lock()
+        # Exclusão entre processos, adquirida por quem grava (ver TravaEntreProcessos)
+        self.trava_processos = TravaEntreProcessos(f"{caminho}.lock")
+        # Último estado montado (snapshot + journal), indexado pela versão dos arquivos
+        self._estado = None
+
+    # Versão dos dados: muda sempre que o snapshot ou o journal são alterados
+    def versao(self):
+        return tuple(
+            assinatura_arquivo(caminho) if os.path.exists(caminho) else None
+            for caminho in (self.caminho, self.caminho_journal)
+        )
+
+    # Snapshot com o journal aplicado; o DataFrame devolvido é compartilhado
+    def _registros_atuais(self):
+        versao = self.versao()
+        if self._estado is not None and self._estado[0] == versao:
+            return self._estado[1]
+        if versao[0] is None:
+            # Se o arquivo não existir, cria um DataFrame vazio com as colunas necessárias
+            df = pd.DataFrame(columns=COLUNAS_REGISTROS)
+        else:
+            df = ler_com_cache(self.caminho, _ler_csv_registros).copy()
+            if versao[1] is not None:
+                df = aplicar_journal(df, ler_com_cache(self.caminho_journal, _ler_journal))
+        self._estado = (versao, df)
+        return df
+
+    def carregar(self):
+        return aplicar_esquema(self._registros_atuais())
+
+    def total(self):
+        return len(self._registros_atuais())
+
+    def ids_unicos(self):
+        return set(self._registros_atuais()['id_unico'])
+
+    # Grava o snapshot completo de forma atômica (arquivo temporário + os.replace) e zera o journal
+    def _gravar_snapshot(self, df):
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8', newline='') as f:
+            formatar_para_gravacao(df).to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        # Se o processo cair antes desta linha, o journal é reaplicado sobre o novo
+        # snapshot sem efeito, pois as alterações gravam valores absolutos
+        if os.path.exists(self.caminho_journal):
+            os.truncate(self.caminho_journal, 0)
+        invalidar_cache(self.caminho)
+        invalidar_cache(self.caminho_journal)
+        self._estado = None
+
+    # Reescrita completa, usada na inicialização e em migrações
+    def salvar(self, df):
+        with self._trava:
+            self._gravar_snapshot(df)
+
+    # Acrescenta armários novos ao final do CSV, sem reescrever os existentes
+    def inserir(self, novos):
+        if len(novos) == 0:
+            return
+        with self._trava:
+            if not os.path.exists(self.caminho) or os.path.getsize(self.caminho) == 0:
+                self._gravar_snapshot(novos)
+                return
+            # As linhas novas seguem o cabeçalho do arquivo, e não as colunas em memória
+            colunas = list(pd.read_csv(self.caminho, nrows=0).columns)
+            if 'id_unico' not in colunas:
+                # Cadastro antigo, sem a coluna id_unico: regrava o arquivo inteiro
+                # (com o journal incorporado), já com a coluna
+                self._gravar_snapshot(pd.concat([self._registros_atuais(), novos], ignore_index=True))
+                return
+            with open(self.caminho, 'rb') as f:
+                # Garante que a primeira linha nova não seja colada à última existente
+                f.seek(-1, os.SEEK_END)
+                separador = '' if f.read(1) == b'\n' else '\n'
+            with open(self.caminho, 'a', encoding='utf-8', newline='') as f:
+                f.write(separador)
+                formatar_para_gravacao(novos).reindex(columns=colunas).to_csv(f, index=False, header=False)
+                f.flush()
+                os.fsync(f.fileno())
+            invalidar_cache(self.caminho)
+            self._estado = None
+
+    # Incorpora o journal ao CSV de registros
+    def compactar(self):
+        with self._trava:
+            self._gravar_snapshot(self._registros_atuais())
+
+    # Registra um lote de alterações [(id_unico, campos), ...] em uma única linha do journal
+    def registrar_alteracoes(self, alteracoes):
+        if alteracoes:
+            self._anexar_journal({'alteracoes': [
+                {'id_unico': id_unico, 'campos': campos} for id_unico, campos in alteracoes
+            ]})
+
+    def _anexar_journal(self, entrada):
+        dados = (json.dumps(entrada, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._trava:
+            # Um único write com O_APPEND seguido de fsync: a alteração fica em disco
+            # antes da confirmação e o custo independe do tamanho do cadastro
+            fd = os.open(self.caminho_journal, os.O_RDWR | os.O_APPEND | os.O_CREAT | O_BINARIO, 0o644)
+            try:
+                _descartar_linha_incompleta(fd)
+                escritos = 0
+                while escritos < len(dados):
+                    escritos += os.write(fd, dados[escritos:])
+                os.fsync(fd)
+                tamanho_journal = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            invalidar_cache(self.caminho_journal)
+        # Compacta quando o journal passa do limite, para que a leitura continue rápida
+        if tamanho_journal >= self.limite_journal:
+            self.compactar()
+
+
+# Esquema do banco SQLite. Consultas e pesquisas são feitas no cadastro em
+# memória (registro.py); o banco só precisa do índice por id_unico, usado nas
+# atualizações.
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS armarios (
+    id_unico TEXT NOT NULL,
+    numero INTEGER,
+    localizacao TEXT,
+    nome TEXT,
+    turma TEXT,
+    status TEXT,
+    data TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_armarios_id_unico ON armarios (id_unico);
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (chave, valor) VALUES ('versao', 0);
+"""
+
+# Armazenamento em banco SQLite (modo WAL), com atualizações indexadas por id_unico
+class ArmazenamentoSQLite:
+    def __init__(self, caminho=ARQUIVO_SQLITE):
+        self.caminho = caminho
+        # Conexões do sqlite3 não podem ser compartilhadas entre threads; cada
+        # sessão do Streamlit roda em uma thread, então cada uma tem a sua
+        self._local = threading.local()
+        self._conexao().executescript(ESQUEMA_SQLITE)
+        # Exclusão entre processos, adquirida por quem grava (ver TravaEntreProcessos)
+        self.trava_processos = TravaEntreProcessos(f"{caminho}.lock")
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+        return conexao
+
+    # Versão dos dados: contador incrementado na mesma transação de cada escrita
+    def versao(self):
+        return self._conexao().execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()[0]
+
+    def _incrementar_versao(self, conexao):
+        conexao.execute("UPDATE meta SET valor = valor + 1 WHERE chave = 'versao'")
+
+    def carregar(self):
+        colunas = ', '.join(COLUNAS_REGISTROS)
+        return aplicar_esquema(pd.read_sql_query(f"SELECT {colunas} FROM armarios ORDER BY rowid", self._conexao()))
+
+    def total(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM armarios").fetchone()[0]
+
+    def ids_unicos(self):
+        return {linha[0] for linha in self._conexao().execute("SELECT id_unico FROM armarios")}
+
+    # Reescrita completa, usada na inicialização e em migrações
+    def salvar(self, df):
+        self._gravar(df, substituir=True)
+
+    # Acrescenta armários novos, sem tocar nos existentes
+    def inserir(self, novos):
+        if len(novos) > 0:
+            self._gravar(novos, substituir=False)
+
+    def _gravar(self, df, substituir):
+        df = formatar_para_gravacao(df)
+        df = df.astype(object).where(df.notna(), None)
+        conexao = self._conexao()
+        with conexao:
+            if substituir:
+                conexao.execute("DELETE FROM armarios")
+            conexao.executemany(
+                f"INSERT INTO armarios ({', '.join(COLUNAS_REGISTROS)}) VALUES ({', '.join('?' * len(COLUNAS_REGISTROS))})",
+                df.itertuples(index=False, name=None)
+            )
+            self._incrementar_versao(conexao)
+
+    # Atualiza um lote de armários [(id_unico, campos), ...] em uma única transação
+    def registrar_alteracoes(self, alteracoes):
+        if not alteracoes:
+            return
+        conexao = self._conexao()
+        with conexao:
+            for id_unico, campos in alteracoes:
+                colunas = [coluna for coluna in campos if coluna in COLUNAS_REGISTROS and coluna != 'id_unico']
+                atribuicoes = ', '.join(f"{coluna} = ?" for coluna in colunas)
+                conexao.execute(
+                    f"UPDATE armarios SET {atribuicoes} WHERE id_unico = ?",
+                    [campos[coluna] for coluna in colunas] + [id_unico]
+                )
+            self._incrementar_versao(conexao)
+
+
+# Migra o cadastro em CSV (com o journal e o preenchimento de id_unico) para o SQLite
+def migrar_csv_para_sqlite(caminho_csv=ARQUIVO_REGISTROS, caminho_journal=ARQUIVO_JOURNAL,
+                           caminho_sqlite=ARQUIVO_SQLITE):
+    registros = ArmazenamentoCSV(caminho_csv, caminho_journal).carregar()
+    destino = ArmazenamentoSQLite(caminho_sqlite)
+    with destino.trava_processos:
+        destino.salvar(registros)
+    return len(registros)
+
+# Assinatura da planilha já sincronizada com cada armazenamento, neste processo
+_planilhas_sincronizadas = {}
+
+# Se a planilha com essa assinatura (assinatura_arquivo) já foi sincronizada
+# com o armazenamento por alguma sessão deste processo
+def planilha_sincronizada(armazenamento, assinatura):
+    return _planilhas_sincronizadas.get(armazenamento) == assinatura
+
+# Acrescenta ao cadastro os armários da planilha que ainda não existem nele
+# (na primeira execução, todos) e devolve quantos foram acrescentados.
+# Armários já cadastrados nunca são alterados nem removidos. Com a assinatura
+# da planilha, a sincronização fica registrada para planilha_sincronizada.
+def sincronizar_com_planilha(armazenamento, df_info, assinatura=None):
+    esperados = expandir_faixas(df_info)
+    with armazenamento.trava_processos:
+        novos = esperados[~esperados['id_unico'].isin(armazenamento.ids_unicos())]
+        armazenamento.inserir(novos)
+    if assinatura is not None:
+        _planilhas_sincronizadas[armazenamento] = assinatura
+    return len(novos)
+
+# Backends disponíveis, selecionados pela variável de ambiente ARMARIOS_BACKEND
+BACKENDS = {'csv': ArmazenamentoCSV, 'sqlite': ArmazenamentoSQLite}
+
+_armazenamento = None
+_trava_armazenamento = threading.Lock()
+
+# Devolve o armazenamento configurado, compartilhado por todas as sessões do processo
+def obter_armazenamento():
+    global _armazenamento
+    with _trava_armazenamento:
+        if _armazenamento is None:
+            backend = os.environ.get('ARMARIOS_BACKEND', 'csv').lower()
+            if backend not in BACKENDS:
+                raise ValueError(f"Backend de armazenamento desconhecido: '{backend}'. Opções: {', '.join(BACKENDS)}")
+            if backend == 'sqlite':
+                caminho = os.environ.get('ARMARIOS_SQLITE', ARQUIVO_SQLITE)
+                armazenamento = ArmazenamentoSQLite(caminho)
+                # Na primeira execução com o SQLite, o cadastro existente em CSV é migrado
+                if armazenamento.total() == 0 and os.path.exists(ARQUIVO_REGISTROS):
+                    migrar_csv_para_sqlite(caminho_sqlite=caminho)
+            else:
+                armazenamento = ArmazenamentoCSV()
+            _armazenamento = armazenamento
+        return _armazenamento
+
+
+if __name__ == '__main__':
+    # Uso: python armazenamento.py migrar [destino.db]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrar':
+        destino = sys.argv[2] if len(sys.argv) > 2 else ARQUIVO_SQLITE
+        quantidade = migrar_csv_para_sqlite(caminho_sqlite=destino)
+        print(f"{quantidade} armários migrados de '{ARQUIVO_REGISTROS}' para '{destino}'.")
+    else:
+        print("Uso: python armazenamento.py migrar [destino.db]")
+        sys.exit(1)
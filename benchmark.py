@@ -0,0 +1,289 @@
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from armazenamento import (ArmazenamentoCSV, ArmazenamentoSQLite, expandir_faixas, invalidar_cache,
+                           sincronizar_com_planilha)
+from historico import HistoricoArmarios
+from registro import RegistroArmarios
+from relatorios import criar_grafico_ocupacao, criar_grafico_por_localizacao, gerar_exportacao
+
+# Tamanhos (quantidade de armários) medidos quando nenhum é informado
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000]
+
+# Aumento, em relação à linha de base, considerado regressão (0.25 = 25% mais lento)
+TOLERANCIA_PADRAO = 0.25
+
+# Abaixo destes valores as diferenças são ruído e não contam como regressão
+TEMPO_MINIMO_COMPARACAO = 0.005
+MEMORIA_MINIMA_COMPARACAO = 1.0
+
+NOMES = ['ANA', 'BRUNO', 'CARLA', 'DIEGO', 'ELISA', 'FÁBIO', 'GABRIELA', 'HEITOR', 'ÍRIS', 'JOÃO',
+         'KARINA', 'LUCAS', 'MARIA', 'NATÁLIA', 'OTÁVIO', 'PAULA', 'RAFAEL', 'SOFIA', 'TIAGO', 'VITÓRIA']
+SOBRENOMES = ['SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'LIMA', 'PEREIRA', 'COSTA', 'RODRIGUES',
+              'ALMEIDA', 'NASCIMENTO', 'ARAÚJO', 'RIBEIRO', 'CARVALHO', 'GOMES', 'MARTINS']
+
+
+# Planilha sintética de armários (Localização, Início, Fim), com o total de
+# armários dividido igualmente entre as localizações
+def gerar_planilha(total_armarios, localizacoes=10):
+    por_localizacao = np.full(localizacoes, total_armarios // localizacoes)
+    por_localizacao[:total_armarios % localizacoes] += 1
+    return pd.DataFrame({
+        'Localização': [f"BLOCO {i + 1:03d}" for i in range(localizacoes)],
+        'Início': 1,
+        'Fim': por_localizacao
+    })
+
+def _nomes_aleatorios(aleatorio, quantidade, sobrenomes=2):
+    nomes = pd.Series(aleatorio.choice(NOMES, quantidade))
+    for _ in range(sobrenomes):
+        nomes = nomes + ' ' + pd.Series(aleatorio.choice(SOBRENOMES, quantidade))
+    return nomes.to_numpy()
+
+def _turmas_aleatorias(aleatorio, quantidade, turmas):
+    return pd.Series(aleatorio.integers(1, turmas + 1, quantidade)).map('TURMA{:03d}'.format).to_numpy()
+
+# Cadastro sintético a partir da planilha, com a fração informada de armários
+# ocupados por alunos com nomes, turmas e datas aleatórios (reprodutíveis pela semente)
+def gerar_registros(df_info, ocupacao=0.6, turmas=40, semente=42):
+    aleatorio = np.random.default_rng(semente)
+    df = expandir_faixas(df_info)
+    ocupados = aleatorio.random(len(df)) < ocupacao
+    quantidade = int(ocupados.sum())
+    datas = pd.Timestamp('2024-01-01') + pd.to_timedelta(aleatorio.integers(0, 730, quantidade), unit='D')
+    df.loc[ocupados, 'nome'] = _nomes_aleatorios(aleatorio, quantidade)
+    df.loc[ocupados, 'turma'] = _turmas_aleatorias(aleatorio, quantidade, turmas)
+    df.loc[ocupados, 'status'] = 'Ocupado'
+    df.loc[ocupados, 'data'] = datas.strftime('%d-%m-%Y').to_numpy()
+    return df
+
+# Lista sintética de alunos para a atribuição automática
+def gerar_alunos(quantidade, turmas=40, semente=7):
+    aleatorio = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'nome': _nomes_aleatorios(aleatorio, quantidade, sobrenomes=1),
+        'turma': _turmas_aleatorias(aleatorio, quantidade, turmas)
+    })
+
+# Eventos sintéticos de histórico: uma alocação por armário ocupado, com
+# momentos espalhados pelos meses informados a partir de janeiro de 2024
+def gerar_eventos(registros, meses=24, semente=3):
+    aleatorio = np.random.default_rng(semente)
+    ocupados = registros[registros['status'] == 'Ocupado']
+    segundos = aleatorio.integers(0, meses * 30 * 24 * 3600, len(ocupados))
+    return pd.DataFrame({
+        'momento': pd.Timestamp('2024-01-01') + pd.to_timedelta(segundos, unit='s'),
+        'evento': 'alocacao',
+        'id_unico': ocupados['id_unico'].to_numpy(),
+        'numero': ocupados['numero'].to_numpy(),
+        'localizacao': ocupados['localizacao'].to_numpy(),
+        'nome': ocupados['nome'].to_numpy(),
+        'turma': ocupados['turma'].to_numpy(),
+        'operador': 'BENCHMARK'
+    }).to_dict('records')
+
+
+# Executa a função repetidas vezes e devolve a mediana e o mínimo dos tempos.
+# preparar() roda antes de cada execução, fora da medição; se devolver uma
+# tupla, ela é passada como argumentos da função. O pico de memória é medido
+# em uma execução à parte, pois o tracemalloc deixa o código bem mais lento.
+def medir(funcao, preparar=None, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        argumentos = (preparar() if preparar else None) or ()
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao(*argumentos)
+        tempos.append(time.perf_counter() - inicio)
+    argumentos = (preparar() if preparar else None) or ()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcao(*argumentos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'mediana_s': statistics.median(tempos),
+        'minimo_s': min(tempos),
+        'pico_memoria_mb': pico / (1024 * 1024)
+    }
+
+def _alocar_e_liberar(registro, ids):
+    for id_unico in ids:
+        registro.alocar(id_unico, 'ALUNO TESTE', 'TURMA TESTE')
+    for id_unico in ids:
+        registro.liberar(id_unico)
+
+
+# Mede os casos para um cadastro sintético do tamanho informado, com os arquivos
+# em um diretório temporário. Devolve {caso: medição}; casos limita quais são executados.
+def executar_casos(total_armarios, localizacoes=10, ocupacao=0.6, repeticoes=3, backend='csv', casos=None):
+    resultados = {}
+    df_info = gerar_planilha(total_armarios, localizacoes)
+    registros = gerar_registros(df_info, ocupacao)
+
+    def caso(nome, funcao, preparar=None):
+        if casos and nome not in casos:
+            return
+        print(f"  {nome}...", end=' ', flush=True, file=sys.stderr)
+        resultados[nome] = medir(funcao, preparar, repeticoes)
+        print(f"{resultados[nome]['mediana_s'] * 1000:.1f} ms", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        contador = iter(range(sys.maxsize))
+
+        # Armazenamento em arquivos novos; com o mesmo nome, reabre os arquivos
+        # existentes sem aproveitar o cache de leitura
+        def abrir_armazenamento(nome=None):
+            nome = nome or f"registros-{next(contador)}"
+            caminho = os.path.join(diretorio, nome)
+            if backend == 'sqlite':
+                return ArmazenamentoSQLite(f"{caminho}.db")
+            invalidar_cache(f"{caminho}.csv")
+            invalidar_cache(f"{caminho}.journal")
+            return ArmazenamentoCSV(f"{caminho}.csv", f"{caminho}.journal")
+
+        def registro_novo():
+            armazenamento = abrir_armazenamento()
+            armazenamento.salvar(registros)
+            return RegistroArmarios(armazenamento)
+
+        armazenamento = abrir_armazenamento('principal')
+        armazenamento.salvar(registros)
+
+        caminho_planilha = os.path.join(diretorio, 'armarios.xlsx')
+        df_info.to_excel(caminho_planilha, index=False)
+        caso('ler_planilha', lambda: pd.read_excel(caminho_planilha))
+        # Primeira execução: cadastro vazio, todos os armários da planilha são criados
+        caso('inicializar_cadastro', lambda vazio: sincronizar_com_planilha(vazio, df_info),
+             lambda: (abrir_armazenamento(),))
+        # Cadastro já existente: apenas confere quais armários faltam
+        caso('sincronizar_planilha', lambda: sincronizar_com_planilha(armazenamento, df_info))
+        caso('carregar', lambda: RegistroArmarios(abrir_armazenamento('principal')))
+        caso('salvar', lambda: armazenamento.salvar(registros))
+
+        registro = RegistroArmarios(armazenamento)
+        livres = registro.consultar(status='Disponível')['id_unico'].to_numpy()
+        caso('alocar_liberar_100', lambda: _alocar_e_liberar(registro, livres[:100]))
+        caso('filtrar_status_localizacao', lambda: registro.consultar(status='Ocupado', localizacao=registro.localizacoes()[0]))
+        caso('filtrar_nome_contains', lambda: registro.consultar(nome='SILVA'))
+        caso('filtrar_turma_contains', lambda: registro.consultar(turma='TURMA01'))
+        # Primeira pesquisa monta o índice; as seguintes só o consultam
+        caso('buscar_nome_com_indexacao', lambda: registro.buscar('nome', 'SILVA'), registro._indices_busca.clear)
+        caso('buscar_nome', lambda: registro.buscar('nome', 'JOAO SOUZA'))
+        caso('buscar_turma', lambda: registro.buscar('turma', 'TURMA01'))
+        caso('opcoes_seletor', lambda: registro.opcoes_armarios('Disponível', prefixo='1'),
+             registro._opcoes_armarios.clear)
+        caso('exportar_xlsx', lambda: gerar_exportacao(registro.df, 'xlsx'))
+        caso('exportar_csv', lambda: gerar_exportacao(registro.df, 'csv'))
+        contagem = registro.contar_por_status()
+        caso('grafico_ocupacao',
+             lambda: criar_grafico_ocupacao(contagem.get('Ocupado', 0), contagem.get('Disponível', 0)),
+             criar_grafico_ocupacao.cache_clear)
+        caso('grafico_por_localizacao', lambda: criar_grafico_por_localizacao(registro.ocupacao_por_localizacao()),
+             criar_grafico_por_localizacao.cache_clear)
+        alunos = gerar_alunos(min(1000, len(livres)))
+        caso('atribuir_lote_1000', lambda copia: copia.atribuir_lote(alunos), lambda: (registro_novo(),))
+
+        historico = HistoricoArmarios(os.path.join(diretorio, 'historico'))
+        historico.anexar(gerar_eventos(registros))
+        caso('historico_um_mes', lambda: historico.consultar('2025-06-01', '2025-07-01'))
+        caso('historico_ocupantes',
+             lambda: historico.ocupantes(registros['id_unico'].iloc[0], '2025-06-01', '2025-07-01'))
+
+    return resultados
+
+
+# Compara as medições com a linha de base e devolve as regressões:
+# [(tamanho, caso, métrica, valor na base, valor atual)]
+def comparar(base, atual, tolerancia=TOLERANCIA_PADRAO):
+    regressoes = []
+    for tamanho, casos in atual.items():
+        for nome, medicao in casos.items():
+            referencia = base.get(tamanho, {}).get(nome)
+            if referencia is None:
+                continue
+            for metrica, minimo in (('mediana_s', TEMPO_MINIMO_COMPARACAO), ('pico_memoria_mb', MEMORIA_MINIMA_COMPARACAO)):
+                if max(referencia[metrica], medicao[metrica]) < minimo:
+                    continue
+                if medicao[metrica] > referencia[metrica] * (1 + tolerancia):
+                    regressoes.append((tamanho, nome, metrica, referencia[metrica], medicao[metrica]))
+    return regressoes
+
+def imprimir_tabela(resultados, base=None):
+    print(f"{'armários':>10}  {'caso':<28} {'mediana (ms)':>13} {'mínimo (ms)':>12} {'pico (MB)':>10} {'vs base':>9}")
+    for tamanho, casos in resultados.items():
+        for nome, medicao in casos.items():
+            referencia = (base or {}).get(tamanho, {}).get(nome)
+            variacao = ''
+            if referencia and referencia['mediana_s'] > 0:
+                variacao = f"{(medicao['mediana_s'] / referencia['mediana_s'] - 1) * 100:+.0f}%"
+            print(f"{tamanho:>10}  {nome:<28} {medicao['mediana_s'] * 1000:>13.2f} {medicao['minimo_s'] * 1000:>12.2f} "
+                  f"{medicao['pico_memoria_mb']:>10.1f} {variacao:>9}")
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description="Mede carga, gravação, pesquisa, exportação e gráficos do cadastro de armários com dados sintéticos."
+    )
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="quantidades de armários a medir (padrão: %(default)s)")
+    parser.add_argument('--localizacoes', type=int, default=10, help="localizações na planilha (padrão: %(default)s)")
+    parser.add_argument('--ocupacao', type=float, default=0.6, help="fração de armários ocupados (padrão: %(default)s)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="execuções por caso (padrão: %(default)s)")
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--casos', nargs='+', help="executa apenas os casos informados")
+    parser.add_argument('--salvar', metavar='ARQUIVO', help="grava as medições em JSON, como nova linha de base")
+    parser.add_argument('--comparar', metavar='ARQUIVO', help="compara com uma linha de base gravada por --salvar")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="aumento tolerado antes de acusar regressão (padrão: %(default)s)")
+    opcoes = parser.parse_args(argumentos)
+
+    base = None
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        if base['parametros']['backend'] != opcoes.backend:
+            print(f"Aviso: linha de base medida com o backend '{base['parametros']['backend']}'", file=sys.stderr)
+        base = base['resultados']
+
+    resultados = {}
+    for tamanho in opcoes.tamanhos:
+        print(f"{tamanho} armários:", file=sys.stderr)
+        resultados[str(tamanho)] = executar_casos(
+            tamanho, opcoes.localizacoes, opcoes.ocupacao, opcoes.repeticoes, opcoes.backend, opcoes.casos
+        )
+    imprimir_tabela(resultados, base)
+
+    if opcoes.salvar:
+        with open(opcoes.salvar, 'w', encoding='utf-8') as f:
+            json.dump({
+                'gerado_em': pd.Timestamp.now().isoformat(timespec='seconds'),
+                'ambiente': {'python': platform.python_version(), 'pandas': pd.__version__, 'plataforma': platform.platform()},
+                'parametros': {chave: valor for chave, valor in vars(opcoes).items() if chave not in ('salvar', 'comparar')},
+                'resultados': resultados
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Linha de base gravada em '{opcoes.salvar}'.", file=sys.stderr)
+
+    if base is not None:
+        regressoes = comparar(base, resultados, opcoes.tolerancia)
+        for tamanho, nome, metrica, antes, depois in regressoes:
+            print(f"REGRESSÃO {tamanho} armários, {nome}: {metrica} {antes:.4g} -> {depois:.4g}")
+        if regressoes:
+            return 1
+        print("Nenhuma regressão em relação à linha de base.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import unicodedata
+from collections import defaultdict
+
+# Tamanho dos n-gramas do índice; consultas menores usam o índice de prefixos
+TAMANHO_NGRAMA = 3
+
+# Normaliza um texto para a busca: maiúsculas, sem acentos e com espaços simples
+# (JOÃO, João e joao viram JOAO)
+def normalizar(texto):
+    if not isinstance(texto, str):
+        return ''
+    decomposto = unicodedata.normalize('NFKD', texto.upper())
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.split())
+
+def _ngramas(texto):
+    return {texto[i:i + TAMANHO_NGRAMA] for i in range(len(texto) - TAMANHO_NGRAMA + 1)}
+
+# Prefixos curtos (menores que um n-grama) de cada palavra do texto
+def _prefixos(texto):
+    return {palavra[:tamanho] for palavra in texto.split() for tamanho in range(1, TAMANHO_NGRAMA)}
+
+# Qualidade da correspondência (menor é melhor): texto idêntico, início do
+# texto, início de uma palavra e, por último, qualquer trecho
+def _pontuacao(texto, consulta):
+    if texto == consulta:
+        return 0
+    if texto.startswith(consulta):
+        return 1
+    if f" {consulta}" in f" {texto}":
+        return 2
+    return 3
+
+
+# Índice de busca por trechos de texto (n-gramas) e por prefixos de palavras.
+# Cada chave (id_unico) tem um texto normalizado; o índice é atualizado
+# incrementalmente, sem reconstrução, quando um texto muda.
+class IndiceBusca:
+    def __init__(self, itens=()):
+        self._textos = {}
+        self._ngramas = defaultdict(set)
+        self._prefixos = defaultdict(set)
+        for chave, texto in itens:
+            self.adicionar(chave, texto)
+
+    def adicionar(self, chave, texto):
+        self.remover(chave)
+        texto = normalizar(texto)
+        if not texto:
+            return
+        self._textos[chave] = texto
+        for ngrama in _ngramas(texto):
+            self._ngramas[ngrama].add(chave)
+        for prefixo in _prefixos(texto):
+            self._prefixos[prefixo].add(chave)
+
+    def remover(self, chave):
+        texto = self._textos.pop(chave, None)
+        if texto is None:
+            return
+        for ngrama in _ngramas(texto):
+            self._descartar(self._ngramas, ngrama, chave)
+        for prefixo in _prefixos(texto):
+            self._descartar(self._prefixos, prefixo, chave)
+
+    @staticmethod
+    def _descartar(indice, termo, chave):
+        chaves = indice.get(termo)
+        if chaves is not None:
+            chaves.discard(chave)
+            if not chaves:
+                del indice[termo]
+
+    # Devolve as chaves cujo texto contém a consulta, ordenadas pela qualidade
+    # da correspondência. Consultas menores que um n-grama procuram apenas no
+    # início das palavras (JO encontra JOÃO e MARIA JOSÉ).
+    def buscar(self, consulta):
+        consulta = normalizar(consulta)
+        if not consulta:
+            return []
+        if len(consulta) < TAMANHO_NGRAMA:
+            candidatos = self._prefixos.get(consulta, set())
+        else:
+            # Interseção começando pelo menor conjunto de chaves
+            conjuntos = sorted((self._ngramas.get(ngrama, set()) for ngrama in _ngramas(consulta)), key=len)
+            candidatos = set(conjuntos[0])
+            for conjunto in conjuntos[1:]:
+                if not candidatos:
+                    break
+                candidatos &= conjunto
+            # Os n-gramas podem estar em posições diferentes; confirma o trecho
+            candidatos = [chave for chave in candidatos if consulta in self._textos[chave]]
+        return sorted(
+            candidatos,
+            key=lambda chave: (_pontuacao(self._textos[chave], consulta), len(self._textos[chave]), self._textos[chave])
+        )
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # Indisponível no Windows; o pico de memória deixa de ser informado
+    resource = None
+
+# Log estruturado: uma linha JSON por execução medida
+logger = logging.getLogger('armarios.diagnostico')
+
+# Quantidade de execuções mantidas em memória para o resumo
+EXECUCOES_MANTIDAS = 500
+
+
+# Memória residente atual do processo, em MB (None se não for possível medir)
+def memoria_atual_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+# Maior memória residente do processo desde o início, em MB
+def memoria_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+# Medição de uma execução (um rerun do script ou uma exportação): tempo de
+# cada fase, registrado no diagnóstico ao concluir
+class ExecucaoMedida:
+    def __init__(self, diagnostico, tipo='execucao'):
+        self._diagnostico = diagnostico
+        self.tipo = tipo
+        self.fases = {}
+        self._inicio = time.perf_counter()
+        self._fase_aberta = None
+
+    # Mede o bloco como a fase informada (somando, se a fase se repetir)
+    @contextmanager
+    def fase(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nome] = self.fases.get(nome, 0.0) + time.perf_counter() - inicio
+
+    # Começa uma fase que vai até a próxima chamada ou até concluir(); útil para
+    # trechos longos do script que não cabem em um bloco with
+    def iniciar_fase(self, nome):
+        self._encerrar_fase_aberta()
+        self._fase_aberta = (nome, time.perf_counter())
+
+    def _encerrar_fase_aberta(self):
+        if self._fase_aberta is not None:
+            nome, inicio = self._fase_aberta
+            self.fases[nome] = self.fases.get(nome, 0.0) + time.perf_counter() - inicio
+            self._fase_aberta = None
+
+    # Registra a execução com as informações adicionais (página, tamanho do cadastro...)
+    def concluir(self, **informacoes):
+        self._encerrar_fase_aberta()
+        self._diagnostico.registrar({
+            'momento': time.time(),
+            'tipo': self.tipo,
+            'total_s': time.perf_counter() - self._inicio,
+            'fases': dict(self.fases),
+            'memoria_mb': memoria_atual_mb(),
+            **informacoes
+        })
+
+
+# Diagnóstico de desempenho do processo: as últimas execuções medidas ficam em
+# um buffer circular em memória e cada uma também vai para o log estruturado
+class Diagnostico:
+    def __init__(self, execucoes_mantidas=EXECUCOES_MANTIDAS):
+        self._execucoes = deque(maxlen=execucoes_mantidas)
+        self._trava = threading.Lock()
+
+    def iniciar(self, tipo='execucao'):
+        return ExecucaoMedida(self, tipo)
+
+    def registrar(self, execucao):
+        with self._trava:
+            self._execucoes.append(execucao)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(execucao, ensure_ascii=False, default=str))
+
+    def execucoes(self):
+        with self._trava:
+            return list(self._execucoes)
+
+    def limpar(self):
+        with self._trava:
+            self._execucoes.clear()
+
+    # Resumo por fase (incluindo o total de cada tipo de execução): quantidade
+    # de medições, p50, p95 e máximo em milissegundos, das fases mais lentas (p95) às mais rápidas
+    def resumo(self):
+        tempos = {}
+        for execucao in self.execucoes():
+            tempos.setdefault(f"total ({execucao['tipo']})", []).append(execucao['total_s'])
+            for fase, segundos in execucao['fases'].items():
+                tempos.setdefault(fase, []).append(segundos)
+        linhas = [
+            {
+                'fase': fase,
+                'medicoes': len(valores),
+                'p50_ms': float(np.percentile(valores, 50)) * 1000,
+                'p95_ms': float(np.percentile(valores, 95)) * 1000,
+                'max_ms': max(valores) * 1000
+            }
+            for fase, valores in tempos.items()
+        ]
+        resumo = pd.DataFrame(linhas, columns=['fase', 'medicoes', 'p50_ms', 'p95_ms', 'max_ms'])
+        return resumo.sort_values('p95_ms', ascending=False, ignore_index=True)
+
+
+_diagnostico = None
+_trava_diagnostico = threading.Lock()
+
+# Diagnóstico compartilhado por todas as sessões do processo. Variáveis de ambiente:
+# ARMARIOS_DIAGNOSTICO_EXECUCOES (tamanho do buffer) e ARMARIOS_LOG_DIAGNOSTICO
+# (arquivo que recebe o log estruturado, uma linha JSON por execução)
+def obter_diagnostico():
+    global _diagnostico
+    with _trava_diagnostico:
+        if _diagnostico is None:
+            arquivo_log = os.environ.get('ARMARIOS_LOG_DIAGNOSTICO')
+            if arquivo_log:
+                manipulador = logging.FileHandler(arquivo_log, encoding='utf-8')
+                manipulador.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(manipulador)
+                logger.setLevel(logging.INFO)
+            _diagnostico = Diagnostico(int(os.environ.get('ARMARIOS_DIAGNOSTICO_EXECUCOES', EXECUCOES_MANTIDAS)))
+        return _diagnostico
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Diretório do histórico de alocações e liberações, com uma pasta por mês (AAAA-MM)
+DIRETORIO_HISTORICO = 'historico_armarios'
+
+# Quantidade de arquivos de um mês a partir da qual eles são juntados em um só
+LIMITE_PARTES_MES = 32
+
+# Prefixo dos arquivos com os eventos já compactados de um mês
+# (mes-<momento em ns>.parquet; o mais recente vale)
+PREFIXO_COMPACTADO = 'mes-'
+
+# Até quantos meses antes do início de um período se procura a alocação ainda
+# em vigor nele; ocupações mais longas que isso não aparecem no período
+MESES_MAXIMOS_OCUPACAO = 72
+
+EVENTO_ALOCACAO = 'alocacao'
+EVENTO_LIBERACAO = 'liberacao'
+
+ESQUEMA_HISTORICO = pa.schema([
+    ('momento', pa.timestamp('ms')),
+    ('evento', pa.string()),
+    ('id_unico', pa.string()),
+    ('numero', pa.int32()),
+    ('localizacao', pa.string()),
+    ('nome', pa.string()),
+    ('turma', pa.string()),
+    ('operador', pa.string()),
+])
+COLUNAS_HISTORICO = ESQUEMA_HISTORICO.names
+
+
+def _inicio_mes(momento):
+    return pd.Timestamp(momento).to_period('M').start_time
+
+
+# Histórico de eventos (alocação e liberação), somente de inclusão, em arquivos
+# Parquet particionados por mês. Cada gravação cria um arquivo novo na pasta do
+# mês, com os eventos ordenados por momento; quando um mês acumula arquivos
+# demais eles são juntados em um só. As consultas por período leem apenas as
+# pastas dos meses envolvidos, e dentro delas o filtro por momento usa as
+# estatísticas dos arquivos para pular o que está fora do intervalo.
+class HistoricoArmarios:
+    def __init__(self, diretorio=DIRETORIO_HISTORICO):
+        self.diretorio = diretorio
+        # Impede que uma consulta leia a lista de arquivos de um mês enquanto ele é compactado
+        self._trava = threading.Lock()
+        self._sequencia = 0
+        # Arquivos substituídos por cada arquivo compactado (que nunca muda depois de gravado)
+        self._substituidos = {}
+
+    def _diretorio_mes(self, mes):
+        return os.path.join(self.diretorio, mes.strftime('%Y-%m'))
+
+    # Meses com histórico gravado, em ordem
+    def meses(self):
+        if not os.path.isdir(self.diretorio):
+            return []
+        meses = []
+        for nome in sorted(os.listdir(self.diretorio)):
+            try:
+                meses.append(pd.Timestamp(f"{nome}-01"))
+            except ValueError:
+                continue
+        return meses
+
+    # Arquivos de um mês que valem (o compactado mais recente e as partes
+    # gravadas depois dele) e os que ele já substituiu, mas ainda não foram
+    # apagados (a compactação foi interrompida antes de apagá-los)
+    def _listar_mes(self, mes):
+        diretorio = self._diretorio_mes(mes)
+        if not os.path.isdir(diretorio):
+            return [], []
+        nomes = sorted(nome for nome in os.listdir(diretorio) if nome.endswith('.parquet'))
+        compactados = [nome for nome in nomes if nome.startswith(PREFIXO_COMPACTADO)]
+        substituidos = set()
+        if compactados:
+            substituidos = self._substituidos_por(os.path.join(diretorio, compactados[-1]))
+        validos = [os.path.join(diretorio, nome) for nome in nomes if nome not in substituidos]
+        antigos = [os.path.join(diretorio, nome) for nome in nomes if nome in substituidos]
+        return validos, antigos
+
+    def _arquivos_mes(self, mes):
+        return self._listar_mes(mes)[0]
+
+    # Nomes dos arquivos incorporados a um arquivo compactado, gravados nos metadados dele
+    def _substituidos_por(self, caminho):
+        substituidos = self._substituidos.get(caminho)
+        if substituidos is None:
+            metadados = pq.read_schema(caminho).metadata or {}
+            substituidos = frozenset(json.loads(metadados.get(b'substitui', b'[]')))
+            self._substituidos[caminho] = substituidos
+        return substituidos
+
+    # Grava os eventos [{coluna: valor}, ...] no mês de cada um
+    def anexar(self, eventos):
+        if not eventos:
+            return
+        df = pd.DataFrame(eventos, columns=COLUNAS_HISTORICO)
+        df['momento'] = pd.to_datetime(df['momento'])
+        for mes, eventos_mes in df.groupby(df['momento'].dt.to_period('M'), sort=True):
+            diretorio = self._diretorio_mes(mes.start_time)
+            os.makedirs(diretorio, exist_ok=True)
+            with self._trava:
+                self._sequencia += 1
+                nome = f"parte-{time.time_ns()}-{os.getpid()}-{self._sequencia}.parquet"
+            self._gravar_tabela(eventos_mes.sort_values('momento', kind='stable'), os.path.join(diretorio, nome))
+            if len(self._arquivos_mes(mes.start_time)) > LIMITE_PARTES_MES:
+                self.compactar_mes(mes.start_time)
+
+    # Grava em um arquivo temporário e o renomeia, para que uma consulta nunca
+    # encontre um arquivo pela metade
+    @staticmethod
+    def _gravar_tabela(df, caminho, metadados=None):
+        tabela = pa.Table.from_pandas(df, schema=ESQUEMA_HISTORICO, preserve_index=False, safe=False)
+        if metadados:
+            tabela = tabela.replace_schema_metadata(metadados)
+        temporario = caminho + '.tmp'
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, caminho)
+
+    # Junta os arquivos de um mês em um só, ordenado por momento. O arquivo novo
+    # guarda nos metadados os nomes dos que ele substitui, e só depois eles são
+    # apagados: se o processo cair no meio, as consultas ignoram os que sobraram
+    # e nenhum evento é contado duas vezes.
+    def compactar_mes(self, mes):
+        mes = _inicio_mes(mes)
+        with self._trava:
+            arquivos, antigos = self._listar_mes(mes)
+            if len(arquivos) <= 1 and not antigos:
+                return
+            df = pq.read_table(arquivos, schema=ESQUEMA_HISTORICO).to_pandas()
+            substituidos = sorted(os.path.basename(arquivo) for arquivo in arquivos + antigos)
+            compactado = os.path.join(self._diretorio_mes(mes), f"{PREFIXO_COMPACTADO}{time.time_ns()}.parquet")
+            self._gravar_tabela(
+                df.sort_values('momento', kind='stable'), compactado,
+                {b'substitui': json.dumps(substituidos).encode()}
+            )
+            for arquivo in arquivos + antigos:
+                os.remove(arquivo)
+                self._substituidos.pop(arquivo, None)
+
+    # Eventos entre inicio (inclusive) e fim (exclusive), opcionalmente de um
+    # armário, localização ou tipo de evento, em ordem cronológica
+    def consultar(self, inicio=None, fim=None, id_unico=None, localizacao=None, evento=None):
+        inicio = pd.Timestamp(inicio) if inicio is not None else None
+        fim = pd.Timestamp(fim) if fim is not None else None
+        filtros = []
+        if inicio is not None:
+            filtros.append(('momento', '>=', inicio))
+        if fim is not None:
+            filtros.append(('momento', '<', fim))
+        if id_unico is not None:
+            filtros.append(('id_unico', '==', id_unico))
+        if localizacao is not None:
+            filtros.append(('localizacao', '==', localizacao))
+        if evento is not None:
+            filtros.append(('evento', '==', evento))
+
+        # Só os meses que se sobrepõem ao período pedido
+        meses = [
+            mes for mes in self.meses()
+            if (inicio is None or mes >= _inicio_mes(inicio)) and (fim is None or mes < fim)
+        ]
+        with self._trava:
+            arquivos = [arquivo for mes in meses for arquivo in self._arquivos_mes(mes)]
+            if not arquivos:
+                return ESQUEMA_HISTORICO.empty_table().to_pandas()
+            tabela = pq.read_table(arquivos, schema=ESQUEMA_HISTORICO, filters=filtros or None)
+        return tabela.to_pandas().sort_values('momento', kind='stable').reset_index(drop=True)
+
+    # Último evento de um armário antes do momento (DataFrame de uma linha, ou
+    # vazio). Lê os meses de trás para a frente, em blocos que dobram de tamanho
+    # (1, 2, 4... meses), e para no primeiro bloco que tiver algum evento do
+    # armário, sem recuar mais que MESES_MAXIMOS_OCUPACAO
+    def _ultimo_evento_antes(self, id_unico, momento):
+        limite = _inicio_mes(momento) - pd.DateOffset(months=MESES_MAXIMOS_OCUPACAO)
+        meses = [mes for mes in reversed(self.meses()) if limite <= mes <= momento]
+        tamanho = 1
+        while meses:
+            bloco, meses = meses[:tamanho], meses[tamanho:]
+            fim_bloco = min(bloco[0] + pd.DateOffset(months=1), momento)
+            eventos = self.consultar(bloco[-1], fim_bloco, id_unico=id_unico)
+            if len(eventos) > 0:
+                return eventos.tail(1)
+            tamanho *= 2
+        return ESQUEMA_HISTORICO.empty_table().to_pandas()
+
+    # Quem ocupou um armário no período: uma linha por alocação, com o momento
+    # da liberação correspondente (vazio se o aluno ainda estava com o armário
+    # no fim do período).
+    # Lê só os meses do período, mais os necessários para achar a alocação que
+    # já estava em vigor no início dele.
+    def ocupantes(self, id_unico, inicio=None, fim=None):
+        eventos = self.consultar(inicio, fim, id_unico=id_unico)
+        if inicio is not None:
+            anterior = self._ultimo_evento_antes(id_unico, pd.Timestamp(inicio))
+            if len(anterior) > 0 and anterior['evento'].iloc[0] == EVENTO_ALOCACAO:
+                eventos = pd.concat([anterior, eventos], ignore_index=True)
+        alocacoes = eventos[eventos['evento'] == EVENTO_ALOCACAO]
+        liberacoes = eventos[eventos['evento'] == EVENTO_LIBERACAO]
+        ocupacoes = pd.merge_asof(
+            alocacoes[['momento', 'nome', 'turma', 'operador']].rename(columns={'momento': 'alocado_em'}),
+            liberacoes[['momento']].assign(liberado_em=liberacoes['momento']),
+            left_on='alocado_em', right_on='momento', direction='forward'
+        ).drop(columns='momento')
+        # Uma liberação só fecha a ocupação se vier antes da alocação seguinte
+        proxima_alocacao = ocupacoes['alocado_em'].shift(-1)
+        ocupacoes.loc[ocupacoes['liberado_em'] > proxima_alocacao, 'liberado_em'] = pd.NaT
+        return ocupacoes
+
+    # Quantidade de eventos por semana (iniciando na segunda-feira) e localização
+    def eventos_por_semana(self, evento=EVENTO_LIBERACAO, inicio=None, fim=None):
+        eventos = self.consultar(inicio, fim, evento=evento)
+        semanas = eventos['momento'].dt.to_period('W-SUN').dt.start_time.rename('semana')
+        return eventos.groupby([semanas, 'localizacao']).size().unstack('localizacao', fill_value=0)
+
+
+_historicos = {}
+_trava_historicos = threading.Lock()
+
+# Histórico compartilhado por todas as sessões do processo. O diretório pode
+# ser trocado pela variável de ambiente ARMARIOS_HISTORICO.
+def obter_historico():
+    diretorio = os.environ.get('ARMARIOS_HISTORICO', DIRETORIO_HISTORICO)
+    with _trava_historicos:
+        historico = _historicos.get(diretorio)
+        if historico is None:
+            historico = HistoricoArmarios(diretorio)
+            _historicos[diretorio] = historico
+        return historico
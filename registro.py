@@ -0,0 +1,726 @@
+import os
+import sys
+import time
+import heapq
+import hashlib
+import atexit
+import logging
+import datetime
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from armazenamento import CAMPOS_ARMARIO_LIVRE, converter_campos, filtrar_registros
+from historico import EVENTO_ALOCACAO, EVENTO_LIBERACAO
+from busca import IndiceBusca, normalizar
+
+logger = logging.getLogger(__name__)
+
+
+# Erro base das operações do registro; a mensagem é exibida ao usuário
+class ErroRegistro(Exception):
+    pass
+
+
+class ArmarioNaoEncontrado(ErroRegistro):
+    def __init__(self, id_unico):
+        super().__init__(f"Armário '{id_unico}' não encontrado no cadastro.")
+        self.id_unico = id_unico
+
+
+class ArmarioAlteradoMeioTempo(ErroRegistro):
+    def __init__(self, id_unico):
+        super().__init__(
+            f"O armário '{id_unico}' foi alterado por outra sessão enquanto você o consultava. "
+            "Confira os dados atualizados e tente novamente."
+        )
+        self.id_unico = id_unico
+
+
+class SemArmarioDisponivel(ErroRegistro):
+    def __init__(self, localizacao=None):
+        onde = f" em '{localizacao}'" if localizacao is not None else ""
+        super().__init__(f"Não há armários disponíveis{onde}.")
+        self.localizacao = localizacao
+
+
+class ArmarioIndisponivel(ErroRegistro):
+    def __init__(self, id_unico, status):
+        super().__init__(f"O armário '{id_unico}' não pode ser alterado: status atual '{status}'.")
+        self.id_unico = id_unico
+        self.status = status
+
+
+# Contagens de armários por localização e status, montadas uma vez na carga do
+# cadastro e atualizadas em O(1) a cada mudança de status
+class AgregadosOcupacao:
+    def __init__(self, df):
+        # Localizações na ordem em que aparecem no cadastro
+        self._localizacoes = df['localizacao'].unique().tolist()
+        self._por_localizacao = {localizacao: Counter() for localizacao in self._localizacoes}
+        self._por_status = Counter()
+        for (localizacao, status), quantidade in df.groupby(['localizacao', 'status'], sort=False, observed=True).size().items():
+            self._por_localizacao[localizacao][status] += int(quantidade)
+            self._por_status[status] += int(quantidade)
+
+    def mover(self, localizacao, status_anterior, status_novo):
+        if status_anterior == status_novo:
+            return
+        contagem = self._por_localizacao[localizacao]
+        contagem[status_anterior] -= 1
+        contagem[status_novo] += 1
+        self._por_status[status_anterior] -= 1
+        self._por_status[status_novo] += 1
+
+    def localizacoes(self):
+        return list(self._localizacoes)
+
+    def contar_por_status(self, localizacao=None):
+        contagem = self._por_status if localizacao is None else self._por_localizacao[localizacao]
+        return {status: quantidade for status, quantidade in contagem.items() if quantidade}
+
+    # Tupla de (localizacao, ocupados, disponiveis), na ordem do cadastro
+    def ocupacao_por_localizacao(self):
+        return tuple(
+            (localizacao, contagem['Ocupado'], sum(contagem.values()) - contagem['Ocupado'])
+            for localizacao, contagem in self._por_localizacao.items()
+        )
+
+
+# Armários disponíveis de cada localização, em heaps ordenados por numero, para
+# escolher o próximo armário livre em O(log n). A remoção é preguiçosa: um
+# armário ocupado sai do conjunto de livres e só é descartado do heap quando
+# chega ao topo.
+class ArmariosLivres:
+    def __init__(self, df):
+        self._heaps = {localizacao: [] for localizacao in df['localizacao'].unique().tolist()}
+        self._livres = {localizacao: set() for localizacao in self._heaps}
+        disponiveis = df[df['status'] == 'Disponível']
+        for localizacao, numero, id_unico in zip(disponiveis['localizacao'], disponiveis['numero'].tolist(), disponiveis['id_unico']):
+            self._heaps[localizacao].append((numero, id_unico))
+            self._livres[localizacao].add(id_unico)
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+    def liberar(self, localizacao, numero, id_unico):
+        livres = self._livres[localizacao]
+        if id_unico not in livres:
+            livres.add(id_unico)
+            heapq.heappush(self._heaps[localizacao], (numero, id_unico))
+
+    def ocupar(self, localizacao, id_unico):
+        self._livres[localizacao].discard(id_unico)
+        heap = self._heaps[localizacao]
+        # Reconstrói o heap quando as entradas descartadas passam a predominar
+        if len(heap) > 2 * len(self._livres[localizacao]) + 64:
+            heap[:] = [entrada for entrada in heap if entrada[1] in self._livres[localizacao]]
+            heapq.heapify(heap)
+
+    # Armário livre de menor número na localização, sem ocupá-lo (ou None)
+    def proximo(self, localizacao):
+        heap = self._heaps.get(localizacao)
+        if not heap:
+            return None
+        livres = self._livres[localizacao]
+        # Descarta do topo as entradas de armários já ocupados (ou repetidas)
+        while heap and heap[0][1] not in livres:
+            heapq.heappop(heap)
+        return heap[0][1] if heap else None
+
+
+# Cadastro de armários em memória, com índice de id_unico para posição da linha.
+# Uma única instância é compartilhada por todas as sessões do processo
+# (obter_registro_compartilhado). As alterações são serializadas por uma trava,
+# aplicadas no DataFrame em memória e gravadas no armazenamento em lotes por
+# uma thread de gravação (write-behind); com intervalo_gravacao=0 a gravação
+# acontece antes de a operação retornar. Com um histórico (HistoricoArmarios),
+# cada alocação e liberação também gera um evento, gravado junto com o lote.
+class RegistroArmarios:
+    def __init__(self, armazenamento, intervalo_gravacao=0, historico=None):
+        self.armazenamento = armazenamento
+        self.intervalo_gravacao = intervalo_gravacao
+        self.historico = historico
+        # Protege o estado em memória; é reentrante para que as operações possam se compor
+        self._trava = threading.RLock()
+        # Serializa as gravações no armazenamento. Ordem de aquisição: esta
+        # primeiro, depois self._trava (nunca o contrário)
+        self._trava_gravacao = threading.Lock()
+        # Alterações aplicadas em memória e ainda não gravadas: [(id_unico, campos), ...]
+        self._pendentes = []
+        # Eventos de histórico ainda não gravados
+        self._eventos_pendentes = []
+        self._sinal_gravacao = threading.Event()
+        self._gravador = None
+        # Se este registro detém a trava entre processos do armazenamento; ela é
+        # adquirida na primeira alteração e solta quando tudo o que está pendente
+        # foi gravado (ver _alteracao)
+        self._reservado = False
+        self.recarregar()
+
+    # Lê o cadastro completo do armazenamento e reconstrói o índice
+    def recarregar(self):
+        with self._trava:
+            versao = self.armazenamento.versao()
+            self.df = self.armazenamento.carregar().reset_index(drop=True)
+            # A chave inteira do esquema em memória é a posição da linha no cadastro
+            self._posicoes = dict(zip(self.df['id_unico'], self.df['chave'].tolist()))
+            self._colunas = {coluna: posicao for posicao, coluna in enumerate(self.df.columns)}
+            self._versao_armazenamento = versao
+            # Geração do conteúdo carregado: nunca se repete, nem entre processos
+            # ou reinícios, para que ETags e chaves de cache antigas não voltem a valer
+            self._geracao = time.time_ns()
+            self._alteracoes = 0
+            self.agregados = AgregadosOcupacao(self.df)
+            self.livres = ArmariosLivres(self.df)
+            # Linhas de cada localização, para filtrar sem varrer o cadastro inteiro
+            self._posicoes_por_localizacao = self.df.groupby('localizacao', sort=False, observed=True).indices
+            # Índices de busca por nome e turma, montados na primeira pesquisa
+            self._indices_busca = {}
+            # Opções dos seletores de armário, válidas enquanto a versão não muda
+            self._opcoes_armarios = {}
+            self._versao_opcoes = None
+
+    # Recarrega o cadastro se outro processo alterou o armazenamento desde a
+    # última leitura. As alterações pendentes são gravadas antes, para não se perderem.
+    def sincronizar(self):
+        if self.armazenamento.versao() == self._versao_armazenamento:
+            return
+        with self._trava_gravacao, self._trava:
+            try:
+                self._gravar_pendentes()
+            except ErroRegistro:
+                logger.exception("Alterações pendentes descartadas ao sincronizar o cadastro")
+            if self.armazenamento.versao() != self._versao_armazenamento:
+                self.recarregar()
+
+    # Versão do conteúdo em memória, usada como chave de caches derivados do cadastro
+    # (exportações, gráficos)
+    @property
+    def versao(self):
+        return (self._geracao, self._alteracoes)
+
+    # Versão de um armário, para a verificação otimista de alocar/liberar: quem
+    # leu o armário guarda a versão e a informa ao alterá-lo. É um resumo do
+    # conteúdo da linha, e não um contador: continua válida depois de uma
+    # recarga (outro processo gravou, reinício da API) se o armário não mudou,
+    # e uma versão antiga nunca volta a valer para um conteúdo diferente.
+    def versao_armario(self, id_unico):
+        posicao = self.posicao(id_unico)
+        conteudo = '\x1f'.join(str(self._valor(posicao, coluna)) for coluna in ('id_unico', 'nome', 'turma', 'status', 'data'))
+        return hashlib.blake2b(conteudo.encode('utf-8'), digest_size=8).hexdigest()
+
+    def __len__(self):
+        return len(self.df)
+
+    def __contains__(self, id_unico):
+        return id_unico in self._posicoes
+
+    def posicao(self, id_unico):
+        try:
+            return self._posicoes[id_unico]
+        except KeyError:
+            raise ArmarioNaoEncontrado(id_unico) from None
+
+    # Linha do armário, como Series
+    def obter(self, id_unico):
+        with self._trava:
+            return self.df.iloc[self.posicao(id_unico)]
+
+    # Linha do armário (DataFrame de uma linha) e a sua versão, lidas juntas
+    def obter_com_versao(self, id_unico):
+        with self._trava:
+            return self.df.iloc[[self.posicao(id_unico)]], self.versao_armario(id_unico)
+
+    def _valor(self, posicao, coluna):
+        return self.df.iat[posicao, self._colunas[coluna]]
+
+    # Evento de histórico de uma mudança de status; na liberação, o aluno é o
+    # que ocupava o armário antes dela
+    def _evento(self, posicao, campos, momento, operador):
+        alocacao = campos['status'] == 'Ocupado'
+        origem = campos if alocacao else {coluna: self._valor(posicao, coluna) for coluna in ('nome', 'turma')}
+        return {
+            'momento': momento,
+            'evento': EVENTO_ALOCACAO if alocacao else EVENTO_LIBERACAO,
+            'id_unico': self._valor(posicao, 'id_unico'),
+            'numero': self._valor(posicao, 'numero'),
+            'localizacao': self._valor(posicao, 'localizacao'),
+            'nome': origem['nome'],
+            'turma': origem['turma'],
+            'operador': operador,
+        }
+
+    # Aplica as alterações [(id_unico, campos), ...] em memória e as enfileira
+    # para gravação; deve ser chamada com self._trava adquirida
+    def _aplicar_lote(self, alteracoes, operador=None):
+        posicoes = [self.posicao(id_unico) for id_unico, _ in alteracoes]
+        momento = datetime.datetime.now()
+        for posicao, (id_unico, campos) in zip(posicoes, alteracoes):
+            if 'status' in campos:
+                if self.historico is not None and campos['status'] != self._valor(posicao, 'status'):
+                    self._eventos_pendentes.append(self._evento(posicao, campos, momento, operador))
+                localizacao = self._valor(posicao, 'localizacao')
+                self.agregados.mover(localizacao, self._valor(posicao, 'status'), campos['status'])
+                if campos['status'] == 'Disponível':
+                    self.livres.liberar(localizacao, self._valor(posicao, 'numero'), id_unico)
+                else:
+                    self.livres.ocupar(localizacao, id_unico)
+            for coluna, valor in converter_campos(self.df, campos).items():
+                self.df.iat[posicao, self._colunas[coluna]] = valor
+                if coluna in self._indices_busca:
+                    self._indices_busca[coluna].adicionar(id_unico, valor)
+        self._alteracoes += 1
+        self._pendentes.extend(alteracoes)
+
+    # Bloco em que o cadastro pode ser alterado: executa com self._trava
+    # adquirida e com a trava entre processos do armazenamento reservada para
+    # este registro, de modo que nenhum outro processo (ou outro registro sobre
+    # os mesmos arquivos) grave até as alterações do bloco estarem gravadas.
+    # Deve ser usado sem self._trava, pois pode esperar pela trava de outro processo.
+    @contextmanager
+    def _alteracao(self):
+        while True:
+            with self._trava:
+                if self._reservado:
+                    try:
+                        yield
+                    finally:
+                        self._soltar_reserva_ociosa()
+                    return
+            self._reservar()
+
+    # Adquire a trava entre processos e, se outro processo gravou enquanto este
+    # não a detinha, recarrega o cadastro antes de qualquer alteração
+    def _reservar(self):
+        self.armazenamento.trava_processos.adquirir()
+        with self._trava:
+            try:
+                if self.armazenamento.versao() != self._versao_armazenamento:
+                    self.recarregar()
+            except BaseException:
+                self.armazenamento.trava_processos.liberar()
+                raise
+            self._reservado = True
+
+    # Solta a trava entre processos se não há alterações pendentes de gravação
+    # no armazenamento; deve ser chamada com self._trava adquirida
+    def _soltar_reserva_ociosa(self):
+        if self._reservado and not self._pendentes:
+            self._reservado = False
+            self.armazenamento.trava_processos.liberar()
+
+    # Grava no armazenamento, em uma única escrita, tudo o que está pendente, e
+    # depois os eventos de histórico; deve ser chamada com self._trava_gravacao adquirida.
+    # O lote só sai da fila depois de gravado, para que a trava entre processos
+    # não seja solta com ele ainda a caminho do armazenamento.
+    def _gravar_pendentes(self):
+        with self._trava:
+            lote = list(self._pendentes)
+            eventos, self._eventos_pendentes = self._eventos_pendentes, []
+        try:
+            if lote:
+                if self.armazenamento.versao() != self._versao_armazenamento:
+                    # Com a trava reservada ninguém mais grava; se o armazenamento mudou
+                    # assim mesmo (um processo que não usa a trava), as alterações foram
+                    # validadas sobre dados antigos e são descartadas em vez de
+                    # sobrescreverem as novas
+                    with self._trava:
+                        descartadas = len(self._pendentes)
+                        self._pendentes = []
+                        self.recarregar()
+                    raise ErroRegistro(
+                        f"O cadastro foi alterado por outro processo; {descartadas} alterações pendentes foram descartadas"
+                    )
+                try:
+                    self.armazenamento.registrar_alteracoes(lote)
+                except Exception:
+                    # O lote continua na fila; os eventos voltam para a frente dela
+                    with self._trava:
+                        self._eventos_pendentes[:0] = eventos
+                    raise
+                with self._trava:
+                    del self._pendentes[:len(lote)]
+                    self._versao_armazenamento = self.armazenamento.versao()
+            if eventos:
+                try:
+                    self.historico.anexar(eventos)
+                except Exception:
+                    with self._trava:
+                        self._eventos_pendentes[:0] = eventos
+                    raise
+        finally:
+            with self._trava:
+                self._soltar_reserva_ociosa()
+
+    # Grava imediatamente as alterações pendentes
+    def descarregar(self):
+        with self._trava_gravacao:
+            self._gravar_pendentes()
+
+    # Thread de gravação: acorda a cada alteração, espera o intervalo para juntar
+    # as alterações que chegarem nesse meio-tempo e grava tudo de uma vez
+    def _laco_gravacao(self):
+        while True:
+            self._sinal_gravacao.wait()
+            time.sleep(self.intervalo_gravacao)
+            self._sinal_gravacao.clear()
+            try:
+                self.descarregar()
+            except Exception:
+                logger.exception("Falha ao gravar as alterações do cadastro; nova tentativa na próxima alteração")
+
+    # Depois de uma alteração: grava já (intervalo 0) ou acorda a thread de gravação.
+    # Deve ser chamada sem self._trava, para respeitar a ordem das travas.
+    def _agendar_gravacao(self):
+        if self.intervalo_gravacao <= 0:
+            self.descarregar()
+            return
+        if self._gravador is None:
+            with self._trava:
+                if self._gravador is None:
+                    self._gravador = threading.Thread(target=self._laco_gravacao, name='gravacao-armarios', daemon=True)
+                    self._gravador.start()
+                    atexit.register(self.descarregar)
+        self._sinal_gravacao.set()
+
+    # Confere a versão informada por quem leu o armário antes de alterá-lo
+    def _verificar_versao(self, id_unico, versao_esperada):
+        if versao_esperada is not None and self.versao_armario(id_unico) != versao_esperada:
+            raise ArmarioAlteradoMeioTempo(id_unico)
+
+    # Aloca um armário disponível a um aluno e devolve os campos gravados.
+    # Com versao_esperada (de versao_armario), falha se o armário mudou desde a leitura.
+    # O operador (quem fez a alteração) é registrado no histórico.
+    def alocar(self, id_unico, nome, turma, versao_esperada=None, operador=None):
+        with self._alteracao():
+            self._verificar_versao(id_unico, versao_esperada)
+            status = self._valor(self.posicao(id_unico), 'status')
+            if status != 'Disponível':
+                raise ArmarioIndisponivel(id_unico, status)
+            campos = self._campos_alocacao(nome, turma)
+            self._aplicar_lote([(id_unico, campos)], operador)
+        self._agendar_gravacao()
+        return campos
+
+    # Campos gravados na alocação de um armário
+    @staticmethod
+    def _campos_alocacao(nome, turma):
+        return {
+            'nome': nome.upper(),
+            'turma': turma.upper(),
+            'status': 'Ocupado',
+            'data': datetime.datetime.now().strftime("%d-%m-%Y")
+        }
+
+    # Próximo armário livre (menor número) nas localizações informadas, na ordem
+    # dada, ou em qualquer localização na ordem do cadastro (None se não houver)
+    def proximo_livre(self, localizacoes=None):
+        with self._trava:
+            for localizacao in localizacoes if localizacoes is not None else self.localizacoes():
+                id_unico = self.livres.proximo(localizacao)
+                if id_unico is not None:
+                    return id_unico
+            return None
+
+    # Aloca ao aluno o próximo armário livre (ver proximo_livre) e devolve o id_unico
+    def alocar_proximo(self, nome, turma, localizacoes=None, operador=None):
+        with self._alteracao():
+            id_unico = self.proximo_livre(localizacoes)
+            if id_unico is None:
+                raise SemArmarioDisponivel(localizacoes[0] if localizacoes and len(localizacoes) == 1 else None)
+            self._aplicar_lote([(id_unico, self._campos_alocacao(nome, turma))], operador)
+        self._agendar_gravacao()
+        return id_unico
+
+    # Atribui automaticamente um armário a cada aluno de uma lista (colunas nome,
+    # turma e, opcionalmente, localizacao com a localização preferida), em uma
+    # única passada. Sem localização preferida, usa a política turma ->
+    # localização (ou lista de localizações, em ordem de preferência); com
+    # qualquer_localizacao, quem não couber nas preferidas recebe um armário de
+    # outra localização. Devolve um relatório com o armário de cada aluno.
+    def atribuir_lote(self, alunos, politica=None, qualquer_localizacao=True, operador=None):
+        alunos = alunos.rename(columns=lambda coluna: normalizar(str(coluna)).lower().replace(' ', '_'))
+        alunos = alunos.reset_index(drop=True)
+        colunas_vazias = pd.Series('', index=alunos.index)
+        nomes = alunos['nome'].fillna('').astype(str).str.strip() if 'nome' in alunos.columns else colunas_vazias
+        turmas = alunos['turma'].fillna('').astype(str).str.strip() if 'turma' in alunos.columns else colunas_vazias
+        preferidas = alunos['localizacao'].fillna('').astype(str).str.strip() if 'localizacao' in alunos.columns else colunas_vazias
+        politica = {normalizar(turma): destino for turma, destino in (politica or {}).items()}
+
+        ids, resultados = [], []
+        with self._alteracao():
+            # Localizações do cadastro sem diferenciar maiúsculas e acentos
+            por_nome = {normalizar(localizacao): localizacao for localizacao in self.localizacoes()}
+            for nome, turma, preferida in zip(nomes, turmas, preferidas):
+                if not nome or not turma:
+                    ids.append(None)
+                    resultados.append('Nome e turma são obrigatórios')
+                    continue
+                destino = preferida or politica.get(normalizar(turma))
+                if isinstance(destino, str):
+                    destino = [destino]
+                candidatas = [por_nome[normalizar(loc)] for loc in destino or () if normalizar(loc) in por_nome]
+                if destino and not candidatas:
+                    ids.append(None)
+                    resultados.append(f"Localização desconhecida: {', '.join(destino)}")
+                    continue
+                id_unico = self.proximo_livre(candidatas or None)
+                if id_unico is None and candidatas and qualquer_localizacao:
+                    id_unico = self.proximo_livre()
+                if id_unico is None:
+                    ids.append(None)
+                    resultados.append('Sem armário disponível')
+                    continue
+                self._aplicar_lote([(id_unico, self._campos_alocacao(nome, turma))], operador)
+                ids.append(id_unico)
+                if candidatas and self._valor(self.posicao(id_unico), 'localizacao') not in candidatas:
+                    resultados.append('Alocado em outra localização')
+                else:
+                    resultados.append('Alocado')
+            posicoes = [self._posicoes.get(id_unico) for id_unico in ids]
+            relatorio = pd.DataFrame({
+                'linha': alunos.index + 2,
+                'nome': nomes.str.upper(),
+                'turma': turmas.str.upper(),
+                'id_unico': ids,
+                'numero': pd.array([self._valor(p, 'numero') if p is not None else None for p in posicoes], dtype='Int32'),
+                'localizacao': [self._valor(p, 'localizacao') if p is not None else None for p in posicoes],
+                'resultado': resultados
+            })
+        self._agendar_gravacao()
+        return relatorio
+
+    # Libera um armário ocupado
+    def liberar(self, id_unico, versao_esperada=None, operador=None):
+        with self._alteracao():
+            self._verificar_versao(id_unico, versao_esperada)
+            status = self._valor(self.posicao(id_unico), 'status')
+            if status != 'Ocupado':
+                raise ArmarioIndisponivel(id_unico, status)
+            self._aplicar_lote([(id_unico, CAMPOS_ARMARIO_LIVRE)], operador)
+        self._agendar_gravacao()
+        return CAMPOS_ARMARIO_LIVRE
+
+    # Identifica os armários de um lote pelo id_unico ou, na falta dele, pelo
+    # par numero + localizacao (sem diferenciar maiúsculas e acentos)
+    # Devolve os ids encontrados e quais linhas informaram algum identificador
+    def _identificar_lote(self, lote):
+        ids = pd.Series(pd.NA, index=lote.index, dtype=object)
+        informados = pd.Series(False, index=lote.index)
+        if 'id_unico' in lote.columns:
+            ids_lote = lote['id_unico'].astype('string').str.strip().str.upper()
+            ids = ids.fillna(ids_lote.where(ids_lote != '').astype(object))
+            informados |= ids.notna()
+        if 'numero' in lote.columns and 'localizacao' in lote.columns:
+            cadastro = pd.DataFrame({
+                'numero': self.df['numero'].astype('int64'),
+                'localizacao': self.df['localizacao'].astype(object).map(normalizar),
+                'id_cadastro': self.df['id_unico']
+            }).drop_duplicates(['numero', 'localizacao'])
+            # Números não inteiros (13.5) ou fora da faixa viram ausentes, e a
+            # linha é informada como não identificada
+            numeros = pd.to_numeric(lote['numero'], errors='coerce')
+            numeros = numeros.where((numeros % 1 == 0) & (numeros.abs() < 2 ** 31))
+            procurados = pd.DataFrame({
+                'numero': numeros.astype('Int64'),
+                'localizacao': lote['localizacao'].map(normalizar)
+            }, index=lote.index)
+            encontrados = procurados.merge(cadastro, on=['numero', 'localizacao'], how='left')
+            ids = ids.fillna(pd.Series(encontrados['id_cadastro'].to_numpy(), index=lote.index))
+            informados |= procurados['numero'].notna() & (procurados['localizacao'] != '')
+        return ids, informados
+
+    # Valida e aplica um lote de alocações ('alocar': colunas id_unico ou
+    # numero + localizacao, nome e turma) ou de liberações ('liberar'). A
+    # validação é feita de uma vez para o arquivo inteiro e as linhas válidas
+    # são gravadas em uma única escrita. Com tudo_ou_nada, nada é gravado se
+    # houver qualquer erro. Devolve um relatório com o resultado de cada linha.
+    def importar_lote(self, lote, operacao='alocar', tudo_ou_nada=False, operador=None):
+        if operacao not in ('alocar', 'liberar'):
+            raise ValueError(f"Operação de lote desconhecida: '{operacao}'")
+        # A validação e a aplicação acontecem sob a mesma trava, para que nenhuma
+        # outra sessão altere os armários do lote entre uma e outra
+        with self._alteracao():
+            relatorio = self._importar_lote(lote, operacao, tudo_ou_nada, operador)
+        self._agendar_gravacao()
+        return relatorio
+
+    def _importar_lote(self, lote, operacao, tudo_ou_nada, operador):
+        lote = lote.rename(columns=lambda coluna: normalizar(str(coluna)).lower().replace(' ', '_'))
+        lote = lote.reset_index(drop=True)
+        ids, informados = self._identificar_lote(lote)
+        posicoes = ids.map(self._posicoes)
+        status = pd.Series(self.df['status'].to_numpy()[posicoes.fillna(0).astype(int)], index=lote.index)
+        if operacao == 'alocar':
+            nomes = lote['nome'].fillna('').astype(str).str.strip() if 'nome' in lote.columns else pd.Series('', index=lote.index)
+            turmas = lote['turma'].fillna('').astype(str).str.strip() if 'turma' in lote.columns else pd.Series('', index=lote.index)
+
+        # Erros em ordem de prioridade: só o primeiro de cada linha é informado
+        condicoes = [
+            ~informados,
+            posicoes.isna(),
+            ids.duplicated(keep='first')
+        ]
+        erros = [
+            'Armário não identificado (informe id_unico ou numero e localizacao)',
+            'Armário não encontrado no cadastro',
+            'Armário repetido no arquivo'
+        ]
+        if operacao == 'alocar':
+            condicoes += [(nomes == '') | (turmas == ''), status != 'Disponível']
+            erros += ['Nome e turma são obrigatórios', 'Armário já está ocupado']
+        else:
+            condicoes += [status != 'Ocupado']
+            erros += ['Armário não está ocupado']
+        resultado = pd.Series(np.select(condicoes, erros, default=''), index=lote.index)
+        validas = resultado == ''
+
+        relatorio = pd.DataFrame({'linha': lote.index + 2, 'id_unico': ids})
+        if operacao == 'alocar':
+            relatorio['nome'] = nomes.str.upper()
+            relatorio['turma'] = turmas.str.upper()
+
+        if tudo_ou_nada and not validas.all():
+            resultado[validas] = 'Não aplicado: o arquivo contém erros'
+        elif validas.any():
+            if operacao == 'alocar':
+                alteracoes = [
+                    (id_unico, self._campos_alocacao(nome, turma))
+                    for id_unico, nome, turma in zip(ids[validas], nomes[validas], turmas[validas])
+                ]
+            else:
+                alteracoes = [(id_unico, CAMPOS_ARMARIO_LIVRE) for id_unico in ids[validas]]
+            self._aplicar_lote(alteracoes, operador)
+            resultado[validas] = 'Alocado' if operacao == 'alocar' else 'Liberado'
+        relatorio['resultado'] = resultado
+        return relatorio
+
+    # Com localização, o filtro percorre apenas as linhas daquela localização
+    def consultar(self, localizacao=None, **filtros):
+        with self._trava:
+            if localizacao is None:
+                return filtrar_registros(self.df, **filtros)
+            posicoes = self._posicoes_por_localizacao.get(localizacao)
+            if posicoes is None:
+                return self.df.iloc[0:0]
+            return filtrar_registros(self.df.iloc[posicoes], **filtros)
+
+    # Armários de um status (e localização) como opções de seletor: id_unico,
+    # numero, localizacao e o rótulo exibido. A lista completa é montada de
+    # forma vetorizada uma vez por versão do cadastro; os filtros por faixa de
+    # número e por início do número são aplicados sobre ela.
+    def opcoes_armarios(self, status, localizacao=None, numero_min=None, numero_max=None, prefixo=None):
+        with self._trava:
+            if self._versao_opcoes != self.versao:
+                self._opcoes_armarios = {}
+                self._versao_opcoes = self.versao
+            chave = (status, localizacao)
+            opcoes = self._opcoes_armarios.get(chave)
+            if opcoes is None:
+                df = self.consultar(localizacao=localizacao, status=status)
+                numeros = df['numero'].astype(str)
+                opcoes = pd.DataFrame({
+                    'id_unico': df['id_unico'].to_numpy(),
+                    'numero': df['numero'].to_numpy(),
+                    'localizacao': df['localizacao'].to_numpy(),
+                    'numero_texto': numeros.to_numpy(),
+                    'rotulo': rotulos_armarios(df).to_numpy()
+                })
+                self._opcoes_armarios[chave] = opcoes
+        mascara = np.ones(len(opcoes), dtype=bool)
+        if numero_min is not None:
+            mascara &= opcoes['numero'].to_numpy() >= numero_min
+        if numero_max is not None:
+            mascara &= opcoes['numero'].to_numpy() <= numero_max
+        if prefixo:
+            mascara &= opcoes['numero_texto'].str.startswith(prefixo).to_numpy()
+        return opcoes.loc[mascara, ['id_unico', 'numero', 'localizacao', 'rotulo']]
+
+    def _indice_busca(self, coluna):
+        indice = self._indices_busca.get(coluna)
+        if indice is None:
+            indice = IndiceBusca(zip(self.df['id_unico'], self.df[coluna]))
+            self._indices_busca[coluna] = indice
+        return indice
+
+    # Pesquisa por trecho de nome ou turma, sem diferenciar acentos, com os
+    # melhores resultados primeiro (coluna: 'nome' ou 'turma')
+    def buscar(self, coluna, texto, status=None, limite=None):
+        with self._trava:
+            posicoes = [self._posicoes[id_unico] for id_unico in self._indice_busca(coluna).buscar(texto)]
+            resultados = self.df.iloc[posicoes]
+        if status is not None:
+            resultados = resultados[resultados['status'] == status]
+        return resultados if limite is None else resultados.head(limite)
+
+    # Contagens, localizações e ocupação vêm dos agregados, sem percorrer o cadastro
+    def contar_por_status(self, localizacao=None):
+        with self._trava:
+            return self.agregados.contar_por_status(localizacao)
+
+    def ocupacao_por_localizacao(self):
+        with self._trava:
+            return self.agregados.ocupacao_por_localizacao()
+
+    def localizacoes(self):
+        return self.agregados.localizacoes()
+
+
+# Rótulo de cada armário nos seletores ("numero - localizacao"), sem o id_unico
+def rotulos_armarios(df):
+    return df['numero'].astype(str) + ' - ' + df['localizacao'].astype(str)
+
+
+# Intervalo (em segundos) usado pela thread de gravação para juntar alterações
+# em um único lote; 0 grava cada alteração antes de a operação retornar
+INTERVALO_GRAVACAO = float(os.environ.get('ARMARIOS_INTERVALO_GRAVACAO', '0.5'))
+
+_registros_compartilhados = {}
+_trava_registros_compartilhados = threading.Lock()
+
+# Devolve o registro em memória compartilhado por todas as sessões do processo
+# para o armazenamento informado, criando-o na primeira chamada (com o
+# histórico informado, se houver)
+def obter_registro_compartilhado(armazenamento, historico=None):
+    with _trava_registros_compartilhados:
+        registro = _registros_compartilhados.get(armazenamento)
+        if registro is None:
+            registro = RegistroArmarios(armazenamento, INTERVALO_GRAVACAO, historico)
+            _registros_compartilhados[armazenamento] = registro
+    registro.sincronizar()
+    return registro
+
+
+# Monta a política turma -> localizações a partir de uma tabela com as colunas
+# turma e localizacao; várias linhas da mesma turma dão a ordem de preferência
+def politica_de_tabela(tabela):
+    tabela = tabela.rename(columns=lambda coluna: normalizar(str(coluna)).lower())
+    politica = {}
+    for turma, localizacao in zip(tabela['turma'], tabela['localizacao']):
+        if isinstance(turma, str) and isinstance(localizacao, str) and turma.strip() and localizacao.strip():
+            politica.setdefault(turma.strip(), []).append(localizacao.strip())
+    return politica
+
+def _ler_tabela(caminho):
+    if caminho.lower().endswith('.xlsx'):
+        return pd.read_excel(caminho, dtype=str)
+    return pd.read_csv(caminho, dtype=str, sep=None, engine='python')
+
+
+if __name__ == '__main__':
+    # Uso: python registro.py atribuir alunos.csv [politica.csv]
+    # Atribui armários aos alunos do arquivo (colunas nome, turma e, opcionalmente,
+    # localizacao) e escreve o relatório em CSV na saída padrão
+    if len(sys.argv) in (3, 4) and sys.argv[1] == 'atribuir':
+        from armazenamento import obter_armazenamento
+        from historico import obter_historico
+        registro = RegistroArmarios(obter_armazenamento(), historico=obter_historico())
+        politica = politica_de_tabela(_ler_tabela(sys.argv[3])) if len(sys.argv) == 4 else None
+        relatorio = registro.atribuir_lote(_ler_tabela(sys.argv[2]), politica)
+        relatorio.to_csv(sys.stdout, index=False)
+        alocados = relatorio['id_unico'].notna().sum()
+        print(f"{alocados} de {len(relatorio)} alunos receberam armário.", file=sys.stderr)
+    else:
+        print("Uso: python registro.py atribuir alunos.csv [politica.csv]", file=sys.stderr)
+        sys.exit(1)
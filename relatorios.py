@@ -0,0 +1,151 @@
+import io
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import pandas as pd
+from matplotlib.figure import Figure
+from openpyxl import Workbook
+from armazenamento import FORMATO_DATA
+
+# Quantidade de linhas convertidas por vez na exportação, para que a memória
+# usada não cresça com o tamanho do cadastro
+LINHAS_POR_BLOCO = 10_000
+
+# Formatos de exportação: extensão -> (rótulo, tipo MIME)
+FORMATOS_EXPORTACAO = {
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV', 'text/csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+# Limite de memória ocupada pelos arquivos exportados mantidos em cache
+LIMITE_CACHE_EXPORTACAO_BYTES = 64 * 1024 * 1024
+
+def _blocos(df):
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO]
+        # Datas sem horário (a coluna data do cadastro) viram datas do Excel
+        for coluna in bloco.columns[[pd.api.types.is_datetime64_any_dtype(tipo) for tipo in bloco.dtypes]]:
+            bloco = bloco.assign(**{coluna: bloco[coluna].dt.date})
+        # Valores ausentes viram células vazias
+        yield bloco.astype(object).where(bloco.notna(), None)
+
+# Escreve o Excel em modo write_only do openpyxl, que grava as linhas em fluxo
+# em vez de montar a planilha inteira em memória
+def _exportar_xlsx(df, saida):
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet('Dados')
+    aba.append([str(coluna) for coluna in df.columns])
+    for bloco in _blocos(df):
+        for linha in bloco.itertuples(index=False, name=None):
+            aba.append(linha)
+    planilha.save(saida)
+
+def _exportar_csv(df, saida):
+    # utf-8-sig para que o Excel reconheça os acentos ao abrir o arquivo
+    df.to_csv(saida, index=False, encoding='utf-8-sig', chunksize=LINHAS_POR_BLOCO, date_format=FORMATO_DATA)
+
+def _exportar_parquet(df, saida):
+    df.to_parquet(saida, index=False)
+
+_EXPORTADORES = {'xlsx': _exportar_xlsx, 'csv': _exportar_csv, 'parquet': _exportar_parquet}
+
+# Converte um DataFrame para os bytes do arquivo no formato pedido
+def gerar_exportacao(df, formato='xlsx'):
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação indisponível: '{formato}'")
+    saida = io.BytesIO()
+    _EXPORTADORES[formato](df, saida)
+    return saida.getvalue()
+
+
+# Cache de arquivos exportados, compartilhado por todas as sessões: chave -> bytes.
+# Os itens usados há mais tempo são descartados quando o limite é atingido.
+_cache_exportacoes = OrderedDict()
+_tamanho_cache_exportacoes = 0
+_trava_exportacoes = threading.Lock()
+
+# Devolve os bytes da exportação identificada pela chave (parâmetros do filtro,
+# versão do cadastro e formato), gerando o arquivo apenas se ainda não estiver em cache
+def exportacao_em_cache(chave, gerar):
+    global _tamanho_cache_exportacoes
+    with _trava_exportacoes:
+        if chave in _cache_exportacoes:
+            _cache_exportacoes.move_to_end(chave)
+            return _cache_exportacoes[chave]
+    dados = gerar()
+    with _trava_exportacoes:
+        if chave not in _cache_exportacoes and len(dados) <= LIMITE_CACHE_EXPORTACAO_BYTES:
+            _cache_exportacoes[chave] = dados
+            _tamanho_cache_exportacoes += len(dados)
+            while _tamanho_cache_exportacoes > LIMITE_CACHE_EXPORTACAO_BYTES:
+                _, descartado = _cache_exportacoes.popitem(last=False)
+                _tamanho_cache_exportacoes -= len(descartado)
+    return dados
+
+
+# Converte uma figura em PNG e a libera. As figuras são criadas com
+# matplotlib.figure.Figure, fora do registro global do pyplot, para que nenhuma
+# referência a elas sobreviva entre os reruns
+def _figura_para_png(fig):
+    saida = io.BytesIO()
+    fig.savefig(saida, format='png', dpi=200, bbox_inches='tight')
+    fig.clear()
+    return saida.getvalue()
+
+# Função para criar um gráfico de pizza da ocupação dos armários (PNG). A
+# imagem é reaproveitada enquanto as contagens não mudarem.
+@lru_cache(maxsize=32)
+def criar_grafico_ocupacao(ocupados, disponiveis):
+    # Dados para o gráfico de pizza
+    labels = ['Ocupados', 'Disponíveis']
+    sizes = [ocupados, disponiveis]
+    colors = ['#FF9966', '#66B2FF']  # Laranja claro e azul claro
+
+    # Criar o gráfico de pizza
+    fig = Figure(figsize=(4, 2))
+    ax = fig.subplots()
+    wedges, texts, autotexts = ax.pie(
+        sizes,
+        labels=labels,
+        colors=colors,
+        autopct='%1.1f%%',
+        startangle=55,
+        shadow=False,
+        textprops={'fontsize': 6, 'weight': 'bold'}
+    )
+
+    # Personalizar cores dos textos
+    for text in texts:
+        text.set_color('#333333')
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontsize(6)
+        autotext.set_weight('bold')
+
+    ax.axis('equal')  # Garante que o gráfico seja um círculo
+    fig.tight_layout()
+
+    return _figura_para_png(fig)
+
+# Função para criar um gráfico de barras empilhadas com a ocupação de cada
+# localização (PNG). Recebe uma tupla de (localizacao, ocupados, disponiveis)
+# já agregada, e a imagem é reaproveitada enquanto os números não mudarem.
+@lru_cache(maxsize=32)
+def criar_grafico_por_localizacao(ocupacao):
+    localizacoes = [linha[0] for linha in ocupacao]
+    ocupados = [linha[1] for linha in ocupacao]
+    disponiveis = [linha[2] for linha in ocupacao]
+
+    fig = Figure(figsize=(6, 0.4 * len(ocupacao) + 0.8))
+    ax = fig.subplots()
+    ax.barh(localizacoes, ocupados, color='#FF9966', label='Ocupados')
+    ax.barh(localizacoes, disponiveis, left=ocupados, color='#66B2FF', label='Disponíveis')
+    ax.invert_yaxis()  # Mantém a ordem da planilha, de cima para baixo
+    ax.tick_params(labelsize=6)
+    ax.legend(fontsize=6, loc='lower center', bbox_to_anchor=(0.5, 1.0), ncol=2, frameon=False)
+    for lado in ('top', 'right'):
+        ax.spines[lado].set_visible(False)
+    fig.tight_layout()
+
+    return _figura_para_png(fig)